@@ -0,0 +1,178 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from ocr import *
+
+
+# Réseau de référence (échantillons), chargé une seule fois par processus
+
+_base = {}
+
+def _init_processus(fichier):
+
+	"""Charge le réseau dont on utilise les échantillons (voir ReseauOCR.ouvrir)"""
+
+	reseau = ReseauOCR()
+	reseau.ouvrir(fichier)
+	_base["reseau"] = reseau
+
+
+def nom_configuration(config):
+
+	"""Renvoie un nom de fichier pour une configuration, dans l'esprit des graphes déjà produits (ex: 16_0.8_0.6 pour une couche interne de 16 neurones, taux_app = 0.8, inertie = 0.6)"""
+
+	structure = "-".join(str(taille) for taille in config["structure"]) or "mono"
+	gx, gy = config["grille"]
+	return "{}_{}_{}_{}x{}_{}".format(structure, config["taux_app"], config["inertie"], gx, gy, config["codage"])
+
+
+def entrainer_configuration(config):
+
+	"""Entraîne un nouveau réseau construit selon 'config' (dictionnaire: taux_app, inertie, grille, structure, codage, cycles, validation, taille_lot, graine) sur les échantillons du réseau de référence.
+	Renvoie la configuration complétée par les courbes d'erreur (au format de gen_graphe.py), l'erreur finale et la durée de l'entraînement"""
+
+	base = _base["reseau"]
+
+	reseau = ReseauOCR(codage = config["codage"])
+	for classe in base.classes:
+		reseau.ajout_classe(classe)
+	reseau.echantillons = base.echantillons # Les échantillons ne sont pas modifiés: inutile de les copier
+	reseau.cache = base.cache
+	for taille in config["structure"]:
+		reseau.ajout_couche(taille)
+
+	random.seed(config["graine"]) # Mêmes poids initiaux et même mélange des exemples pour une même configuration
+	reseau.initialiser(config["grille"])
+	exemples, resultats = reseau.charger_echantillons()
+
+	cycles, erreurs, erreurs_val = [], [], []
+	debut = time.perf_counter()
+	for cycle, (err, err_val) in enumerate(reseau.entrainer_cycle(exemples, resultats, taux_app = config["taux_app"], inertie = config["inertie"], validation = config["validation"], taille_lot = config["taille_lot"])):
+		cycles.append(cycle)
+		erreurs.append(float(err))
+		erreurs_val.append(float(err_val))
+		if cycle+1 >= config["cycles"]:
+			break
+	duree = time.perf_counter() - debut
+
+	graphes = [("Erreur moyenne", cycles, erreurs)] # Mêmes noms de courbes que l'onglet Apprentissage
+	if config["validation"]:
+		graphes.append(("Erreur de validation", cycles, erreurs_val))
+
+	resultat = dict(config)
+	resultat["graphes"] = graphes
+	resultat["erreur"] = erreurs[-1]
+	resultat["erreur_val"] = erreurs_val[-1]
+	resultat["duree"] = duree
+	return resultat
+
+
+def configurations(taux_app, inertie, grilles, structures, codages, **options):
+
+	"""Renvoie la liste des configurations de la grille de paramètres (toutes les combinaisons), chacune complétée par les options communes. Lève ValueError si le nombre de cycles est inférieur à 1"""
+
+	if options.get("cycles", 1) < 1:
+		raise ValueError("nombre de cycles invalide: {} (au moins 1)".format(options["cycles"]))
+	liste = []
+	for a, i, grille, structure, codage in itertools.product(taux_app, inertie, grilles, structures, codages):
+		config = {"taux_app": a, "inertie": i, "grille": tuple(grille), "structure": tuple(structure), "codage": codage}
+		config.update(options)
+		liste.append(config)
+	return liste
+
+
+def balayer(fichier, configs, dossier, processus = None):
+
+	"""Entraîne chaque configuration dans un ensemble de processus, et écrit dans 'dossier' un fichier JSON par configuration (lisible par gen_graphe.py) ainsi qu'un résumé (resume.csv). Renvoie les résultats, dans l'ordre des configurations"""
+
+	os.makedirs(dossier, exist_ok = True)
+	resultats = []
+
+	with multiprocessing.Pool(processus, initializer = _init_processus, initargs = (fichier, )) as pool:
+		for k, resultat in enumerate(pool.imap(entrainer_configuration, configs)): # Dans l'ordre des configurations
+			nom = nom_configuration(resultat)
+			with open(os.path.join(dossier, nom + ".json"), "w+") as f:
+				json.dump({
+					"graphes": resultat["graphes"],
+					"taux_app": resultat["taux_app"],
+					"inertie": resultat["inertie"],
+					"delta": round(resultat["duree"], 1),
+				}, f)
+			print("[{}/{}] {}: erreur {:.5f} ({:.1f}s)".format(k+1, len(configs), nom, resultat["erreur"], resultat["duree"]))
+			resultats.append(resultat)
+
+	colonnes = ["configuration", "taux_app", "inertie", "grille", "structure", "codage", "erreur", "erreur_val", "duree"]
+	with open(os.path.join(dossier, "resume.csv"), "w+", newline = "") as f:
+		ecrivain = csv.writer(f)
+		ecrivain.writerow(colonnes)
+		for resultat in resultats:
+			gx, gy = resultat["grille"]
+			structure = ",".join(str(taille) for taille in resultat["structure"])
+			ecrivain.writerow([nom_configuration(resultat), resultat["taux_app"], resultat["inertie"], "{}x{}".format(gx, gy), structure, resultat["codage"], resultat["erreur"], resultat["erreur_val"], round(resultat["duree"], 3)])
+
+	return resultats
+
+
+def afficher_resume(resultats):
+
+	"""Affiche le tableau récapitulatif, de la plus petite erreur finale à la plus grande"""
+
+	print("{:<32}{:>14}{:>14}{:>12}".format("Configuration", "Erreur", "Validation", "Durée (s)"))
+	for resultat in sorted(resultats, key = lambda r: r["erreur"]):
+		print("{:<32}{:>14.5f}{:>14.5f}{:>12.2f}".format(nom_configuration(resultat), resultat["erreur"], resultat["erreur_val"], resultat["duree"]))
+
+
+def lire_grille(texte):
+
+	"""Lit une grille écrite '3x5'"""
+
+	gx, gy = texte.lower().split("x")
+	return (int(gx), int(gy))
+
+
+def lire_cycles(texte):
+
+	"""Lit un nombre de cycles d'entraînement (au moins 1)"""
+
+	cycles = int(texte)
+	if cycles < 1:
+		raise argparse.ArgumentTypeError("au moins 1 cycle: {}".format(texte))
+	return cycles
+
+
+def lire_structure(texte):
+
+	"""Lit les tailles des couches internes écrites comme dans l'onglet Structure ('16' ou '16, 12'), 'mono' pour aucune couche interne"""
+
+	if texte.strip() in ("", "mono"):
+		return ()
+	return tuple(int(taille.strip()) for taille in texte.split(","))
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description = "Balayage d'hyper-paramètres: entraîne un réseau pour chaque combinaison de paramètres, sur les échantillons d'un fichier de réseau.")
+	parser.add_argument("fichier", help = "le fichier de réseau dont on utilise les échantillons")
+	parser.add_argument("-a", "--taux-app", type = float, nargs = "+", default = [0.8], help = "taux d'apprentissage")
+	parser.add_argument("-i", "--inertie", type = float, nargs = "+", default = [0.0], help = "inerties")
+	parser.add_argument("-g", "--grille", type = lire_grille, nargs = "+", default = [(3, 5)], help = "grilles (ex: 3x5)")
+	parser.add_argument("-s", "--structure", type = lire_structure, nargs = "+", default = [()], help = "couches internes (ex: mono, 16, '16,12')")
+	parser.add_argument("-k", "--codage", nargs = "+", default = ["simple"], choices = list(Reseau.codages.keys()), help = "codages de la couche de sortie")
+	parser.add_argument("-c", "--cycles", type = lire_cycles, default = 100, help = "nombre de cycles d'entraînement")
+	parser.add_argument("-l", "--taille-lot", type = int, default = None, help = "entraînement par lots de cette taille")
+	parser.add_argument("--sans-validation", action = "store_true", help = "ne pas calculer l'erreur de validation")
+	parser.add_argument("--graine", type = int, default = 0, help = "graine aléatoire (la même pour chaque configuration)")
+	parser.add_argument("-p", "--processus", type = int, default = None, help = "nombre de processus (par défaut, un par coeur)")
+	parser.add_argument("-o", "--dossier", default = "balayage", help = "dossier de sortie")
+	args = parser.parse_args()
+
+	configs = configurations(args.taux_app, args.inertie, args.grille, args.structure, args.codage,
+		cycles = args.cycles, validation = not args.sans_validation, taille_lot = args.taille_lot, graine = args.graine)
+	resultats = balayer(args.fichier, configs, args.dossier, processus = args.processus)
+	afficher_resume(resultats)
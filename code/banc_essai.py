@@ -0,0 +1,171 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from ocr import *
+
+
+def donnees_synthetiques(nb_classes = 10, par_classe = 40, taille = 15, bruit = 0.15, graine = 0):
+
+	"""Génère des exemples (vecteurs normés) répartis autour d'un "prototype" par classe, pour tester sans fichier d'échantillons. Renvoie un tuple (classes, exemples, resultats) comme ReseauOCR.charger_echantillons"""
+
+	rng = np.random.default_rng(graine)
+	prototypes = rng.random((nb_classes, taille))
+	classes = [str(i) for i in range(nb_classes)]
+	exemples, resultats = [], []
+	for i in range(nb_classes):
+		for k in range(par_classe):
+			vecteur = np.clip(prototypes[i] + bruit*rng.standard_normal(taille), 0, None)
+			exemples.append((vecteur/np.linalg.norm(vecteur)).tolist())
+			resultats.append([1 if j == i else 0 for j in range(nb_classes)])
+	return classes, exemples, resultats
+
+
+def charger(chemin):
+
+	"""Charge les échantillons d'un fichier de réseau (voir ReseauOCR.ouvrir). Renvoie un tuple (classes, exemples, resultats, codage): les résultats sont codés avec le codage du réseau sauvé"""
+
+	reseau = ReseauOCR()
+	reseau.ouvrir(chemin)
+	exemples, resultats = reseau.charger_echantillons()
+	return reseau.classes, exemples, resultats, reseau.codage
+
+
+def chronometrer(fonction, *args, repetitions = 5):
+
+	"""Renvoie le meilleur temps d'exécution (en secondes) de fonction(*args) sur plusieurs répétitions"""
+
+	temps = []
+	for i in range(repetitions):
+		debut = time.perf_counter()
+		fonction(*args)
+		temps.append(time.perf_counter() - debut)
+	return min(temps)
+
+
+def reseau_test(classes, taille_entree, couches_internes, graine, codage = "simple"):
+
+	"""Créer un réseau pour les essais, initialisé avec une graine fixe"""
+
+	reseau = Reseau()
+	reseau.utiliser_codage(codage) # Avant les classes: le codage donne la taille de la couche de sortie
+	for classe in classes:
+		reseau.ajout_classe(classe)
+	for taille in couches_internes:
+		reseau.ajout_couche(taille)
+	random.seed(graine)
+	reseau.initialiser(taille_entree)
+	return reseau
+
+
+def classes_attendues(reseau, resultats):
+
+	"""Renvoie la classe attendue pour chaque résultat (sortie voulue du réseau), décodée selon le codage du réseau (voir Reseau.decodages; à défaut, la classe de représentation la plus proche)"""
+
+	resultats = np.asarray(resultats, dtype = float)
+	if reseau.codage in Reseau.decodages:
+		indices = Reseau.decodages[reseau.codage](reseau, resultats)
+	else:
+		indices = np.argmin(np.sum((resultats[:, np.newaxis] - reseau.codes()[np.newaxis])**2, axis = 2), axis = 1)
+	return [reseau.classes[i] for i in indices.tolist()]
+
+
+def banc_activations(classes, exemples, resultats, cycles = 100, taille_lot = None, processus = None, couches_internes = (16, ), graine = 0, codage = "simple"):
+
+	"""Compare les fonctions d'activation de Couche.activations: écart à la sigmoide exacte, vitesse d'évaluation, et résultat d'un entraînement (erreur finale, taux de reconnaissance, durée) avec cette activation sur les couches internes"""
+
+	x = np.linspace(-10, 10, 1000000)
+	exacte = sigmoide(x)
+
+	print("{:<16}{:>14}{:>14}{:>14}{:>14}{:>12}".format("Activation", "Écart max", "ns/valeur", "Erreur", "Reconnus", "Durée (s)"))
+
+	for nom, activation in Couche.activations.items():
+
+		if nom == "softmax": # Réservée à la couche de sortie (voir Reseau.utiliser_softmax)
+			continue
+
+		ecart = np.max(np.abs(activation(x) - exacte)) if nom.startswith("sigmoide") else float("nan")
+		vitesse = chronometrer(activation, x)/len(x)*1e9
+
+		reseau = reseau_test(classes, len(exemples[0]), couches_internes, graine, codage)
+		reseau.utiliser_activation(nom, couches = range(len(reseau)-1)) # La couche de sortie reste une sigmoide (sorties entre 0 et 1)
+		random.seed(graine)
+		debut = time.perf_counter()
+		for cycle, (err, err_val) in enumerate(reseau.entrainer_cycle(exemples, resultats, taux_app = 0.1, inertie = 0.8, validation = False, taille_lot = taille_lot, processus = processus)):
+			if cycle+1 >= cycles:
+				break
+		duree = time.perf_counter() - debut
+
+		attendues = classes_attendues(reseau, resultats)
+		reconnus = np.mean([classees[:1] == [attendue] for classees, attendue in zip(reseau.classer_lot(exemples, filtre = float("inf")), attendues)])
+
+		print("{:<16}{:>14.2e}{:>14.2f}{:>14.5f}{:>13.1f}%{:>12.2f}".format(nom, ecart, vitesse, err, 100*reconnus, duree))
+
+
+# Taux d'apprentissage de chaque optimiseur pour le banc d'essai: les règles adaptatives (RMSprop, Adam) demandent des taux bien plus petits
+
+taux_optimiseurs = {
+	"inertie": (0.1, 0.8),
+	"nesterov": (0.1, 0.8),
+	"rmsprop": (0.005, 0.0),
+	"adam": (0.005, 0.0),
+}
+
+def banc_optimiseurs(classes, exemples, resultats, cycles = 100, cible = 0.05, taille_lot = None, processus = None, calendrier = None, couches_internes = (16, ), graine = 0, codage = "simple"):
+
+	"""Compare les optimiseurs de Couche.optimiseurs: nombre de cycles et temps nécessaires pour atteindre l'erreur moyenne 'cible' (ou "-" si elle n'est pas atteinte en 'cycles' cycles), erreur finale et taux de reconnaissance"""
+
+	print("{:<16}{:>10}{:>10}{:>14}{:>14}{:>14}{:>12}".format("Optimiseur", "Taux", "Inertie", "Cycles cible", "Temps cible", "Erreur", "Reconnus"))
+
+	for nom in Couche.optimiseurs:
+
+		taux_app, inertie = taux_optimiseurs.get(nom, (0.01, 0.0))
+		reseau = reseau_test(classes, len(exemples[0]), couches_internes, graine, codage)
+		reseau.utiliser_optimiseur(nom)
+		random.seed(graine)
+
+		cycle_cible, temps_cible = None, None
+		debut = time.perf_counter()
+		for cycle, (err, err_val) in enumerate(reseau.entrainer_cycle(exemples, resultats, taux_app = taux_app, inertie = inertie, validation = False, taille_lot = taille_lot, processus = processus, calendrier = calendrier)):
+			if cycle_cible is None and err <= cible:
+				cycle_cible, temps_cible = cycle+1, time.perf_counter() - debut
+			if cycle+1 >= cycles:
+				break
+
+		attendues = classes_attendues(reseau, resultats)
+		reconnus = np.mean([classees[:1] == [attendue] for classees, attendue in zip(reseau.classer_lot(exemples, filtre = float("inf")), attendues)])
+
+		cycle_cible = "-" if cycle_cible is None else str(cycle_cible)
+		temps_cible = "-" if temps_cible is None else "{:.2f}s".format(temps_cible)
+		print("{:<16}{:>10}{:>10}{:>14}{:>14}{:>14.5f}{:>11.1f}%".format(nom, taux_app, inertie, cycle_cible, temps_cible, err, 100*reconnus))
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description = "Banc d'essai des réseaux de neurones (fonctions d'activation, optimiseurs).")
+	parser.add_argument("-b", "--banc", nargs = "+", default = ["activations", "optimiseurs"], choices = ["activations", "optimiseurs"], help = "bancs d'essai à lancer")
+	parser.add_argument("fichier", nargs = "?", default = None, help = "un fichier de réseau dont on utilise les échantillons (sinon, données synthétiques)")
+	parser.add_argument("-c", "--cycles", type = int, default = 100, help = "nombre de cycles d'entraînement")
+	parser.add_argument("-l", "--taille-lot", type = int, default = None, help = "entraînement par lots de cette taille")
+	parser.add_argument("-p", "--processus", type = int, default = None, help = "entraînement par lots réparti sur ce nombre de processus")
+	parser.add_argument("-e", "--cible", type = float, default = 0.05, help = "erreur moyenne visée (banc des optimiseurs)")
+	parser.add_argument("--palier", type = int, default = None, help = "taux d'apprentissage divisé par deux tous les PALIER cycles (banc des optimiseurs)")
+	parser.add_argument("-g", "--graine", type = int, default = 0, help = "graine aléatoire")
+	args = parser.parse_args()
+	if args.cycles < 1:
+		parser.error("au moins 1 cycle: {}".format(args.cycles))
+
+	if args.fichier is not None:
+		classes, exemples, resultats, codage = charger(args.fichier)
+	else:
+		classes, exemples, resultats = donnees_synthetiques(graine = args.graine)
+		codage = "simple"
+
+	if "activations" in args.banc:
+		banc_activations(classes, exemples, resultats, cycles = args.cycles, taille_lot = args.taille_lot, processus = args.processus, graine = args.graine, codage = codage)
+		print()
+	if "optimiseurs" in args.banc:
+		calendrier = None if args.palier is None else calendrier_palier(0.5, args.palier)
+		banc_optimiseurs(classes, exemples, resultats, cycles = args.cycles, cible = args.cible, taille_lot = args.taille_lot, processus = args.processus, calendrier = calendrier, graine = args.graine, codage = codage)
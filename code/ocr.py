@@ -5,6 +5,7 @@ from PIL import Image
 import math
 import numpy as np
 import random
+import heapq
 
 # Pour sauvegardes dans des fichiers
 import json
@@ -13,29 +14,91 @@ import zipfile
 import base64
 import os
 
+# Pour le cache des vecteurs d'entrée
+import collections
+import functools
+import hashlib
+
+# Pour l'entraînement sur plusieurs processus
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Pour la reconnaissance en flux (voir ReseauOCR.reconnaitre_flux)
+import threading
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 
 class ImageBinaire:
 
 	"""Classe pour manipuler les images en noir et blanc"""
 
-	def __init__(self, img):
+	def __init__(self, img = None, tableau = None):
 
 		# On ne peut malheureusement pas hériter de la classe Image de PIL, il faut donc garder en mémoire une image PIL sur laquelle on travaille (voir également __getattr__)
+		# L'image peut aussi être stockée sous forme de tableau NumPy de booléens (True = pixel noir), sur lequel les algorithmes travaillent bien plus rapidement. L'image PIL n'est alors reconstruite qu'au besoin (save, resize, affichage...)
 
-		self._img = img
+		self._pil = img
+		self._tab = tableau
+		self._integrale = None # Voir ImageBinaire.integrale
 
 	def __getattr__(self, key):
 
 		# Si une méthode n'est pas implémentée par ImageBinaire, on appelle cette méthode sur l'image interne PIL: cela évite d'avoir a réecrire toutes les méthodes d'image de PIL"""
 
-		if key == "_img": raise AttributeError() # Evite les récursions infinies, à priori
-		return getattr(self._img, key)
+		if key in ("_img", "_pil", "_tab", "_integrale"): raise AttributeError(key) # Evite les récursions infinies, à priori
+		attribut = getattr(self._img, key)
+		if key in ImageBinaire._methodes_modifiantes:
+			self._tab = None # L'image PIL risque d'être modifiée, le tableau ne sera plus à jour
+		return attribut
+
+	_methodes_modifiantes = ("load", "putpixel", "paste", "putdata", "frombytes", "thumbnail") # Méthodes PIL qui modifient l'image en place
+
+	@property
+	def _img(self):
+
+		"""Image PIL interne, reconstruite depuis le tableau si nécessaire"""
+
+		if self._pil is None:
+			self._pil = Image.fromarray(~self._tab) # Mode 1 directement depuis un tableau de booléens (True = blanc pour PIL)
+		return self._pil
+
+	@_img.setter
+	def _img(self, img):
+
+		self._pil = img
+		self._tab = None
+
+	@property
+	def tableau(self):
+
+		"""Vue NumPy de l'image: tableau de booléens de taille (h, w), True pour les pixels noirs"""
+
+		if self._tab is None:
+			self._tab = ~np.asarray(self._pil)
+		return self._tab
+
+	@tableau.setter
+	def tableau(self, tableau):
+
+		self._tab = tableau
+		self._pil = None # L'image PIL n'est plus à jour
+
+	@property
+	def size(self):
+
+		if self._tab is not None:
+			h, w = self._tab.shape
+			return w, h
+		return self._pil.size
 
 	def new(size, color = 0):
 
 		"""Créer une nouvelle ImageBinaire"""
 
-		return ImageBinaire(Image.new("1", size, color)) # Mode 1: noir+blanc
+		w, h = size
+		return ImageBinaire(tableau = np.full((h, w), color == 0)) # Mode 1: noir+blanc, pas besoin de créer l'image PIL tout de suite
 
 	def rotate(self, angle, resample = 0, expand = 0):
 
@@ -82,98 +145,148 @@ class ImageBinaire:
 
 		"""Fonction créant une image binaire à partir d'une liste de pixels noirs"""
 
-		x = lambda coord: coord[0]
-		y = lambda coord: coord[1]
-		x0, y0, x1, y1 = (min(liste, key = x)[0], min(liste, key = y)[1], max(liste, key = x)[0], max(liste, key = y)[1]) # On récupère les coins
+		coords = np.array(list(liste)).reshape(-1, 2) # 'liste' peut aussi être un ensemble (voir ImageBinaire.decouper2)
+		x0, y0 = coords.min(axis = 0) # On récupère les coins
+		x1, y1 = coords.max(axis = 0)
 		w, h = x1-x0+1, y1-y0+1 # On calcule la taille de l'image
 
-		img = ImageBinaire.new((w, h), 1)
-		for x, y in liste:
-			img.putpixel((x-x0, y-y0), 0) # On écrit nos pixels
+		tab = np.zeros((h, w), dtype = bool)
+		tab[coords[:, 1]-y0, coords[:, 0]-x0] = True # On écrit nos pixels, d'un coup
 
-		return img
+		return ImageBinaire(tableau = tab)
 
 	def enlever_parasites(self, seuil):
 
-		"""Fonction filtrant les "parasites" (comme les lignes d'une feuille à carreaux) de taille inférieure ou égale à un seuil"""
+		"""Fonction filtrant les "parasites" (comme les lignes d'une feuille à carreaux) de taille inférieure ou égale à un seuil. Le seuil peut être un entier, ou un couple (seuil_x, seuil_y) pour filtrer différemment les plages horizontales et verticales"""
 		# Inspiré de http://stackoverflow.com/questions/11253899/removing-the-background-noise-of-a-captcha-image-by-replicating-the-chopping-fil
 
-		self.enlever_parasites_verticalement(seuil)
-		self.enlever_parasites_horizontalement(seuil)
+		try: # On suppose que 'seuil' est un couple
+			seuil_x, seuil_y = seuil
+		except Exception: # Un problème? C'est donc un seul seuil pour les deux axes
+			seuil_x, seuil_y = seuil, seuil
+
+		# Même résultat que les deux filtres successifs, mais sans repasser par l'image PIL entre les deux
+		tab = self.tableau
+		tab = tab & ~ImageBinaire._plages_courtes(tab, seuil_x)
+		tab = tab & ~ImageBinaire._plages_courtes(tab.T, seuil_y).T # Les colonnes de l'image sont les lignes de la transposée: pas besoin de tourner l'image
+		self.tableau = tab
+
+	def _plages(tab):
+
+		"""Fonction interne: découpe chaque ligne du tableau en plages alternées de pixels blancs et noirs. Renvoie les limites des plages (indices dans le tableau "aplati", où chaque ligne est complétée par un pixel blanc) et la couleur de chaque plage (True pour noir)"""
+
+		h, w = tab.shape
+		bords = np.zeros((h, w+1), dtype = bool) # Une colonne blanche en plus: une plage ne peut pas continuer d'une ligne à l'autre
+		bords[:, :w] = tab
+		plat = bords.ravel()
+
+		if not plat.size: # Image vide
+			return np.zeros(1, dtype = int), plat
+
+		changements = np.flatnonzero(plat[1:] != plat[:-1]) + 1 # Changements de couleur
+		limites = np.concatenate(([0], changements, [plat.size]))
+		return limites, plat[limites[:-1]]
+
+	def _plages_courtes(tab, seuil):
+
+		"""Fonction interne (voir ImageBinaire.enlever_parasites): renvoie le masque des pixels noirs appartenant à une plage horizontale (pixels noirs consécutifs d'une ligne) de longueur inférieure ou égale au seuil"""
+
+		h, w = tab.shape
+		limites, noirs = ImageBinaire._plages(tab)
+		longueurs = np.diff(limites)
+		courtes = noirs & (longueurs <= seuil) # Plages noires trop courtes
+		courtes = np.repeat(courtes, longueurs) # Chaque pixel hérite de l'état de sa plage
+
+		return courtes.reshape((h, w+1))[:, :w]
 
 	def enlever_parasites_verticalement(self, seuil):
 
 		"""Fonction filtrant les parasites verticalement"""
 
-		# Approche naïve et un peu lente...
-
-		w, h = self.size
-		pix = self.load()
-		noir, blanc = 0, 1
-
-		y = -1
-		while y < h-1: # On parcoure selon y...
-			y += 1
-			x = -1
-			while x < w-1: # ...et selon x
-				x += 1
-				if pix[x, y] == noir: # Si on trouve un pixel noir
-					total = 0 # On compte le nombre de pixels noirs à la suite:
-					for x2 in range(x, w):
-						if pix[x2, y] == noir:
-							total += 1
-						else:
-							break
-					if total <= seuil: # Si le total est inférieur au seuil, on enlève ces pixels: résultat, les petits groupes de pixels sont enlevés
-						for c in range(total):
-							pix[x+c, y] = blanc
-					x += total
+		# On parcoure les lignes: les plages de pixels noirs plus courtes que le seuil sont enlevées, résultat, les petits groupes de pixels sont enlevés
+
+		tab = self.tableau
+		self.tableau = tab & ~ImageBinaire._plages_courtes(tab, seuil)
 
 	def enlever_parasites_horizontalement(self, seuil):
 
 		"""Fonction filtrant les parasites horizontalement"""
 
-		self.rotate(90)
-		self.enlever_parasites_verticalement(seuil)
-		self.rotate(-90)
+		# Même chose sur les colonnes, qui sont les lignes de la transposée
 
-	def decouper_verticalement(self):
+		tab = self.tableau
+		self.tableau = tab & ~ImageBinaire._plages_courtes(tab.T, seuil).T
 
-		"""Découpe une image verticalement et renvoie une liste contenant ses "caractères" sous forme de liste de coordonnées des pixels noirs. Les caractères peuvent être reconstruits à l'aide de ImageBinaire.depuis_liste"""
+	def _colonnes(self, largeur_min = 5):
 
-		w, h = self.size
-		pix = self.load()
-		noir, blanc = 0, 1
+		"""Fonction interne (voir ImageBinaire.decouper_verticalement): renvoie les intervalles de colonnes [x0, x1[ des "caractères" de l'image, ainsi que le nombre de pixels noirs de chaque colonne"""
 
-		caracs = []
-		carac = []
+		noirs = np.count_nonzero(self.tableau, axis = 0) # Nombre de pixels noirs par colonne, calculé une seule fois
+		w = len(noirs)
+
+		intervalles = []
+		debut = 0 # Première colonne du caractère en cours (pixels pas encore rendus)
 		pause = False
 		col_0 = 0 # col_0 et col_1 délimitent des caractères
 
-		for x in range(w): # On parcoure chaque colonne
+		for x, n in enumerate(noirs.tolist()): # On parcoure chaque colonne, mais plus chaque pixel
 
 			col_1 = x # col_1
 
-			for y in range(h): # On regarde chaque pixel de la colonne
-				p = pix[x, y]
-				if p == noir:
-					carac.append((x, y)) # Sil un pixel est noir on ajoute les coordonées du pixel au caractère
-					if not pause: # Si on est en train de chercher l'autre extrêmité d'un caractère (pause == false), on indique qu'il faut continuer
+			if n: # Sil un pixel est noir il fait partie du caractère
+				if not pause: # Si on est en train de chercher l'autre extrêmité d'un caractère (pause == false), on indique qu'il faut continuer
+					col_1 = None
+				else: # Sinon, on se trouve dans un espace entre deux caractères: un pixel noir signifie que l'on parcourt un nouveau caractère, on modifie la borne gauche (col_0)
+					pause = False
+					col_0 = x
+					if n > 1: # Comme dans le parcours pixel par pixel, c'est le pixel noir suivant qui indique de continuer
 						col_1 = None
-					else: # Sinon, on se trouve dans un espace entre deux caractères: un pixel noir signifie que l'on parcourt un nouveau caractère, on modifie la borne gauche (col_0)
-						pause = False
-						col_0 = x
 
 			if x == w-1: col_1 = x # Bug sinon à la dernière itération
 
 			if col_1 is not None and not pause: # Si on cherche la borne droite d'un caractère (pause == false) et si on a pas trouvé de pixels noirs dans cette colonne, alors on a un caractère!
 				pause = True
-				if col_1 - col_0 > 5: # On ne garde que les caractères suffisamment larges (parasites ignorés)
-					caracs.append(carac)
-					carac = []
+				if col_1 - col_0 > largeur_min: # On ne garde que les caractères suffisamment larges (parasites ignorés)
+					intervalles.append((debut, x+1))
+					debut = x+1
 
+		return intervalles, noirs
+
+	def decouper_verticalement(self, largeur_min = 5):
+
+		"""Découpe une image verticalement et renvoie une liste contenant ses "caractères" sous forme de liste de coordonnées des pixels noirs. Les caractères peuvent être reconstruits à l'aide de ImageBinaire.depuis_liste"""
+
+		tab = self.tableau
+		caracs = []
+		for x0, x1 in self._colonnes(largeur_min)[0]:
+			xs, ys = np.nonzero(tab[:, x0:x1].T) # Transposée: les pixels sont donnés colonne par colonne
+			caracs.append(list(zip((xs + x0).tolist(), ys.tolist())))
+		return caracs
+
+	def decouper_colonnes(self, largeur_min = 5):
+
+		"""Découpe une image verticalement comme ImageBinaire.decouper_verticalement, mais renvoie directement les "caractères" sous forme d'images. Ces images sont des vues sur l'image d'origine (pas de copie des pixels), réduites aux pixels noirs"""
+
+		tab = self.tableau
+		caracs = []
+		intervalles, noirs = self._colonnes(largeur_min)
+		for x0, x1 in intervalles:
+			colonnes = np.flatnonzero(noirs[x0:x1])
+			if not len(colonnes):
+				continue
+			x0, x1 = x0 + colonnes[0], x0 + colonnes[-1] + 1 # On resserre sur les colonnes contenant des pixels noirs...
+			lignes = np.flatnonzero(tab[:, x0:x1].any(axis = 1))
+			caracs.append(ImageBinaire(tableau = tab[lignes[0]:lignes[-1]+1, x0:x1])) # ... et sur les lignes
 		return caracs
 
+	def caracteres(self, decoupage):
+
+		"""Renvoie la liste des caractères de l'image sous forme d'images, obtenus avec l'algorithme de découpage 'decoupage' (voir ImageBinaire.decouper_colonnes, ImageBinaire.decouper...), qui peut renvoyer des images ou des listes de pixels noirs. Si 'decoupage' vaut False, l'image est considérée comme un seul caractère"""
+
+		if decoupage is False:
+			return [self]
+		return [carac if isinstance(carac, ImageBinaire) else ImageBinaire.depuis_liste(carac) for carac in decoupage(self)]
+
 	def decouper_horizontalement(self):
 
 		"""Découpe une image horizontalement et renvoie une liste contenant ses "caractères" sous forme de liste"""
@@ -196,102 +309,106 @@ class ImageBinaire:
 
 		return nouv_caracs
 
-	def _cases_autour(self, ax, ay):
-
-		"""Fonction interne (voir ImageBinaire.decouper)"""
-
-		cases = []
-		w, h = self.size
-		if ax != 0:
-			cases.append([ax-1, ay])
-		if ax+1 != w:
-			cases.append([ax+1, ay])
-		if ay != 0:
-			cases.append([ax, ay-1])
-		if ay+1 != h:
-			cases.append([ax, ay+1])
-
-		return cases
-
-	def decouper(self):
+	def etiqueter(self, connexite = 4):
+
+		"""Étiquette les groupes de pixels noirs connexes (4-connexité ou 8-connexité). Renvoie un tuple (etiquettes, boites, tailles): le tableau (h, w) des étiquettes (0 pour le fond, puis 1, 2... dans l'ordre de parcours colonne par colonne), et pour chaque groupe sa boîte (x0, y0, x1, y1) au format de crop() et son nombre de pixels"""
+
+		# Étiquetage par plages: on travaille sur les plages de pixels noirs de chaque colonne (bien moins nombreuses que les pixels), on réunit les plages qui se touchent d'une colonne à l'autre (union-find), puis on étiquette les pixels plage par plage
+
+		tab = self.tableau
+		h, w = tab.shape
+		limites, noirs = ImageBinaire._plages(tab.T) # Les colonnes de l'image sont les lignes de la transposée
+		debuts, fins = limites[:-1][noirs], limites[1:][noirs] # Plages noires, dans l'ordre de parcours
+		n = len(debuts)
+
+		# Plages de la colonne précédente touchant chaque plage: comme les plages sont triées, ce sont des indices consécutifs qu'on trouve par dichotomie
+		d = 1 if connexite == 8 else 0 # En 8-connexité, les plages qui se touchent par un coin sont voisines
+		mini = np.searchsorted(fins, debuts - (h+1) - d, side = "right")
+		maxi = np.searchsorted(debuts, fins - (h+1) + d, side = "left")
+		nombres = np.maximum(maxi - mini, 0)
+		plages = np.repeat(np.arange(n), nombres)
+		voisines = np.repeat(mini - np.cumsum(nombres) + nombres, nombres) + np.arange(len(plages))
+
+		# Union-find: chaque plage pointe vers une plage de son groupe, la racine étant la première plage du groupe
+		parents = list(range(n))
+		for a, b in zip(plages.tolist(), voisines.tolist()):
+			while parents[a] != a:
+				parents[a] = a = parents[parents[a]] # Compression de chemin (par moitié)
+			while parents[b] != b:
+				parents[b] = b = parents[parents[b]]
+			if a < b: a, b = b, a
+			parents[a] = b
+		for i in range(n): # Deuxième passe: le parent d'une plage la précède toujours, sa racine est donc déjà connue
+			parents[i] = parents[parents[i]]
+		racines = np.array(parents, dtype = int)
+
+		# Les racines, triées, donnent l'ordre des groupes (par premier pixel)
+		racines, groupes = np.unique(racines, return_inverse = True)
+		groupes = groupes.reshape(n) + 1
+		etiquettes = np.zeros(len(noirs), dtype = np.int32)
+		etiquettes[noirs] = groupes
+		etiquettes = np.repeat(etiquettes, np.diff(limites)).reshape((w, h+1))[:, :h].T
+
+		# Boîtes et tailles, directement à partir des plages
+		k = len(racines)
+		xs = debuts//(h+1)
+		y0s, y1s = debuts - xs*(h+1), fins - xs*(h+1)
+		boites = np.zeros((4, k), dtype = int)
+		boites[0], boites[1] = w, h
+		np.minimum.at(boites[0], groupes-1, xs)
+		np.minimum.at(boites[1], groupes-1, y0s)
+		np.maximum.at(boites[2], groupes-1, xs+1)
+		np.maximum.at(boites[3], groupes-1, y1s)
+		tailles = np.bincount(groupes-1, weights = fins - debuts, minlength = k).astype(int)
+
+		return etiquettes, [tuple(boite) for boite in boites.T.tolist()], tailles.tolist()
+
+	def _groupes(self, etiquettes, ordre):
+
+		"""Fonction interne: rassemble les pixels noirs (x, y) de chaque groupe étiqueté, dans l'ordre de parcours colonne par colonne. Les groupes sont donnés dans l'ordre 'ordre' (liste d'étiquettes)"""
+
+		xs, ys = np.nonzero(etiquettes.T)
+		e = etiquettes[ys, xs]
+		tri = np.argsort(e, kind = "stable")
+		coupures = np.searchsorted(e[tri], np.arange(1, len(ordre)+1))
+		pixels = list(zip(xs[tri].tolist(), ys[tri].tolist()))
+		coupures = coupures.tolist() + [len(pixels)]
+		return [pixels[coupures[i-1]:coupures[i]] for i in ordre]
+
+	def decouper(self, connexite = 4):
+
+		"""Sépare les groupes de pixels d'une image, renvoyés dans l'ordre de leur premier pixel (colonne par colonne) sous forme de listes de coordonnées [x, y]"""
+
+		etiquettes, boites, tailles = self.etiqueter(connexite)
+		return [[[x, y] for x, y in groupe] for groupe in self._groupes(etiquettes, range(1, len(tailles)+1))]
+
+	def decouper2(self, connexite = 4):
 
 		"""Sépare les groupes de pixels d'une image"""
 
-		w, h = self.size
-		pix = self.load()
-		noir, blanc = 0, 1
-
-		caracs = []
-
-		for x in range(w):
-			for y in range(h):
-				liste = None
-				if pix[x, y] == noir:
-					verif = True
-					for c in caracs:
-						if [x, y] in c:
-							verif = False
-					if verif == True:
-						liste = [[x, y]]
-						for ax, ay in liste:
-							for bx, by in self._cases_autour(ax, ay):
-								if [bx, by] not in liste:
-									if pix[bx, by] == noir:
-										liste.append([bx, by])
-				if liste != None:
-					caracs.append(liste)
+		etiquettes, boites, tailles = self.etiqueter(connexite)
 
-		return caracs
-
-	def decouper2(self):
-
-		"""Sépare les groupes de pixels d'une image"""
+		# Les groupes sont rendus dans le même ordre qu'avant: selon leur dernier pixel dans l'ordre de parcours
+		derniers = np.zeros(len(tailles) + 1, dtype = int)
+		xs, ys = np.nonzero(etiquettes.T)
+		np.maximum.at(derniers, etiquettes[ys, xs], np.arange(len(xs)))
+		ordre = np.argsort(derniers[1:]) + 1
 
-		pix = self.load()
-		w, h = self.size
-
-		mini_groupes = [] # mini_groupes: liste de sets (ensemble) contenant les coordonnées d'un pixel noir, et des 4 pixels ajdacents
-		for x in range(w):
-			for y in range(h):
-				if pix[x, y] == 0:
-					mini_groupe = set()
-					mini_groupe.add((x, y))
-					for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-						x2, y2 = x + dx, y + dy
-						if 0 <= x2 < w and 0 <= y2 < h and pix[x2, y2] == 0: # Problèmes de bords
-							mini_groupe.add((x2, y2))
-					mini_groupes.append(mini_groupe)
-
-		groupes = [] # Groupes de pixels finaux
-		a_enlever = []
-		for mini_groupe in mini_groupes:
-			for groupe in groupes:
-				if len(mini_groupe & groupe): # Si il y a une intersection entre un groupe final et un mini_groupe (pixel noir + pixels voisins)
-					mini_groupe = mini_groupe | groupe # On fait l'union
-					a_enlever.append(groupe) # Et on marque ce groupe comme inutile (mini_groupe est plus grand à présent)
-			for groupe in a_enlever:
-				groupes.remove(groupe)
-			a_enlever = []
-			groupes.append(mini_groupe)
-
-		return groupes
+		return [set(groupe) for groupe in self._groupes(etiquettes, ordre.tolist())]
 
 	def bounding_box(self):
 
 		"""Renvoie les coordonnées de la plus petite boîte contenant les pixels noirs de l'image"""
 
-		w, h = self.size
-		pix = self.load()
-		ax, ay, bx, by = w, h, 0, 0
+		tab = self.tableau
+		h, w = tab.shape
+		colonnes = np.flatnonzero(tab.any(axis = 0))
+		lignes = np.flatnonzero(tab.any(axis = 1))
 
-		# On pourrait aussi utiliser min, max... mais on fait toutes les comparaisons dans une boucle, mieux?
-		for x in range(w):
-			for y in range(h):
-				if pix[x, y] == 0:
-					if x <= ax: ax = x
-					if x >= bx: bx = x
-					if y <= ay: ay = y
-					if y >= by: by = y
+		if len(colonnes):
+			ax, ay, bx, by = int(colonnes[0]), int(lignes[0]), int(colonnes[-1]), int(lignes[-1])
+		else:
+			ax, ay, bx, by = w, h, 0, 0
 
 		if ax > 0: ax -= 1
 		if ay > 0: ay -= 1
@@ -303,34 +420,84 @@ class ImageBinaire:
 
 		"""Fonction pour "recentrer" l'image, ie la réduire à sa bounding_box (modification en place)"""
 
-		self._img = self._img.crop(self.bounding_box())
+		ax, ay, bx, by = self.bounding_box()
+		if bx < ax or by < ay: # Image vide: on laisse PIL gérer ce cas particulier
+			self._img = self._img.crop((ax, ay, bx, by))
+		else:
+			self.tableau = self.tableau[ay:by, ax:bx] # Simple vue sur le tableau, pas de copie
+
+	def vecteur(self, grille = [3, 5]):
+
+		"""Renvoie le vecteur d'entrée d'un réseau pour cette image: les proportions (voir ImageBinaire.proportions) de l'image recentrée. L'image elle-même n'est pas modifiée"""
+
+		image = ImageBinaire(tableau = self.tableau) # Simple vue sur le tableau
+		image.recentrer()
+		return image.proportions(grille)
+
+	def integrale(self):
+
+		"""Renvoie l'image intégrale (table des sommes cumulées) de taille (h+1, w+1): la case [y, x] contient le nombre de pixels noirs du rectangle [0, x[ x [0, y[. Le nombre de pixels noirs de n'importe quel rectangle s'obtient alors avec quatre valeurs"""
+
+		# On garde l'image intégrale en mémoire tant que le tableau ne change pas (les méthodes d'ImageBinaire ne modifient jamais un tableau en place, elles en créent un nouveau)
+		tab = self.tableau
+		if self._integrale is None or self._integrale[0] is not tab:
+			h, w = tab.shape
+			integrale = np.zeros((h+1, w+1), dtype = np.int64)
+			np.cumsum(tab, axis = 0, out = integrale[1:, 1:])
+			np.cumsum(integrale[1:, 1:], axis = 1, out = integrale[1:, 1:])
+			self._integrale = (tab, integrale)
+		return self._integrale[1]
 
 	def proportions(self, grille = [3, 5]):
 
 		"""Renvoie la proportion en pixels noirs de chaque case d'une grille de decoupe, le vecteur obtenu est ensuite normé"""
 
-		w, h = self.size
-		pix = self.load()
-		gx, gy = grille # Taille de la "grille" de découpage
-		tx, ty = math.ceil(w/gx), math.ceil(h/gy) # Taille de chaque carreau de la grille
-		pourcentages = [0 for i in range(gx*gy)]
-		noir, blanc = 0, 1
+		return self.proportions_grilles([grille])[0]
+
+	def proportions_grilles(self, grilles):
+
+		"""Comme ImageBinaire.proportions, mais pour plusieurs grilles à la fois (par exemple [(3, 5), (5, 7), (8, 12)]): l'image intégrale n'est calculée qu'une fois. Renvoie la liste des vecteurs, dans l'ordre des grilles"""
+
+		integrale = self.integrale()
+		h, w = integrale.shape[0]-1, integrale.shape[1]-1
+		vecteurs = []
 
-		for x in range(w):
-			for y in range(h):
-				if pix[x, y] == noir:
-					cx, cy = x//tx, y//ty
-					zone = cx%gx + cy*gx
-					pourcentages[zone] += 1
+		for gx, gy in grilles: # Taille de la "grille" de découpage
+			tx, ty = math.ceil(w/gx), math.ceil(h/gy) # Taille de chaque carreau de la grille
 
-		vecteur = [v/(tx*ty) for v in pourcentages]
-		norme = np.linalg.norm(vecteur)
-		return [e/norme for e in vecteur] # On pourrait renvoyer une array numpy... à voir, plusieurs modifications en amont
+			# Bords des carreaux (les derniers carreaux peuvent déborder de l'image), puis quatre lectures par carreau
+			xs = np.minimum(np.arange(gx+1)*tx, w)
+			ys = np.minimum(np.arange(gy+1)*ty, h)
+			coins = integrale[np.ix_(ys, xs)]
+			pourcentages = (coins[1:, 1:] - coins[:-1, 1:] - coins[1:, :-1] + coins[:-1, :-1]).ravel()
+
+			vecteur = pourcentages/(tx*ty)
+			norme = np.linalg.norm(vecteur)
+			vecteurs.append((vecteur/norme).tolist())
+
+		return vecteurs
 
 
 class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__, len(), et ainsi de suite... bref, un comportement de liste!
 
-	"""Un réseau de neurones artificiels généraliste, c'est une liste modifiée de listes de neurones (objets Neurone)"""
+	"""Un réseau de neurones artificiels généraliste, c'est une liste modifiée de couches (objets Couche), elles-mêmes des listes de neurones (objets Neurone)"""
+
+	# Les couches ajoutées sous forme de listes de neurones sont converties en objets Couche, qui rangent les poids dans une matrice
+
+	def append(self, couche):
+
+		list.append(self, Couche.depuis(couche))
+
+	def insert(self, index, couche):
+
+		list.insert(self, index, Couche.depuis(couche))
+
+	def __setitem__(self, index, couche):
+
+		if isinstance(index, slice):
+			list.__setitem__(self, index, [Couche.depuis(c) for c in couche])
+		else:
+			list.__setitem__(self, index, Couche.depuis(couche))
 
 	def __str__(self):
 
@@ -346,6 +513,7 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 
 		self.codage = codage
 		self.classes = []
+		self._vider_codes()
 		for classe in classes:
 			self.ajout_classe(classe)
 
@@ -368,13 +536,10 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 		donnees = {}
 		donnees["codage"] = self.codage
 		donnees["classes"] = self.classes
-		donnees["structure"] = liste = []
-		# On créé simplement une liste contenant des listes (couches) de liste de nombres (les neurones ~ liste de poids)
-		for couche in self:
-			tmp = []
-			for neurone in couche:
-				tmp.append([poids for poids in neurone])
-			liste.append(tmp)
+		# On créé simplement une liste contenant des listes (couches) de liste de nombres (les neurones ~ liste de poids): c'est la matrice de chaque couche
+		donnees["structure"] = [couche.matrice.tolist() for couche in self]
+		donnees["activations"] = [couche.activation.nom for couche in self]
+		donnees["optimiseurs"] = [couche.optimiseur.nom for couche in self]
 		return donnees
 
 	def _import(self, donnees):
@@ -387,9 +552,14 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 
 		self.codage = donnees.get("codage", "simple")
 		self.classes = donnees.get("classes", [])
+		self._vider_codes()
 		del self[:] # Brutal, mais efficace...
 		for couche in donnees["structure"]:
-			self.append([Neurone(poids_neurone) for poids_neurone in couche])
+			self.append([Neurone(poids_neurone) for poids_neurone in couche]) # Converti en Couche par Reseau.append
+		for couche, nom in zip(self, donnees.get("activations", [])): # Anciens fichiers: sigmoide partout
+			couche.utiliser_activation(nom)
+		for couche, nom in zip(self, donnees.get("optimiseurs", [])):
+			couche.utiliser_optimiseur(nom)
 
 	def codage_simple(self, i):
 
@@ -423,24 +593,107 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 		"binaire": codage_binaire,
 	}
 
+	def decodage_simple(self, sorties):
+
+		"""Décodage direct pour le codage simple: indice du neurone de sortie le plus actif, pour chaque ligne de 'sorties'"""
+
+		return np.argmax(sorties, axis = 1)
+
+	def decodage_binaire(self, sorties):
+
+		"""Décodage direct pour le codage binaire: chaque neurone de sortie donne un bit (actif si sa sortie dépasse 0.5), le dernier étant le bit de poids faible"""
+
+		bits = (sorties > 0.5).astype(int)
+		return bits @ (2**np.arange(bits.shape[1]-1, -1, -1)) # Lecture du nombre binaire, pour chaque ligne
+
+	decodages = { # Facultatif: sans décodage direct, Reseau.decoder_lot prend la classe la plus proche
+		"simple": decodage_simple,
+		"binaire": decodage_binaire,
+	}
+
 	def utiliser_codage(self, nom):
 
 		"""Indique quel codage de la couche de sortie utiliser. Renvoie False si le codage est inconnu!"""
 
 		if nom in Reseau.codages:
 			self.codage = nom
+			self._vider_codes()
+			if nom != "simple" and self.softmax: # La softmax n'a de sens qu'avec un seul neurone de sortie par classe
+				self.utiliser_softmax(False)
 			return True
 		else:
 			return False
 
+	@property
+	def softmax(self):
+
+		"""Vrai si la couche de sortie est une softmax (voir Reseau.utiliser_softmax)"""
+
+		return len(self) > 0 and self.couche_sortie().activation.nom == "softmax"
+
+	def utiliser_softmax(self, actif = True):
+
+		"""Utilise (ou non) une couche de sortie softmax, entraînée en minimisant l'entropie croisée plutôt que l'erreur quadratique: les sorties sont des probabilités, et Reseau.classer range simplement les classes par probabilité décroissante.
+		Uniquement avec le codage simple, et une fois les classes ajoutées: renvoie False sinon. L'option est sauvée avec les fonctions d'activation (voir Reseau._export)"""
+
+		if len(self) == 0 or (actif and self.codage != "simple"):
+			return False
+		self.couche_sortie().utiliser_activation("softmax" if actif else "sigmoide")
+		return True
+
+	def utiliser_activation(self, nom, couches = None):
+
+		"""Indique quelle fonction d'activation utiliser (voir Couche.activations) pour les couches d'indices 'couches', ou toutes les couches par défaut. Renvoie False si la fonction est inconnue!"""
+
+		if nom not in Couche.activations:
+			return False
+		for i, couche in enumerate(self):
+			if couches is None or i in couches:
+				couche.utiliser_activation(nom)
+		return True
+
+	def utiliser_optimiseur(self, nom, couches = None):
+
+		"""Indique quelle règle de correction des poids utiliser (voir Couche.optimiseurs) pour les couches d'indices 'couches', ou toutes les couches par défaut. Renvoie False si la règle est inconnue!"""
+
+		if nom not in Couche.optimiseurs:
+			return False
+		for i, couche in enumerate(self):
+			if couches is None or i in couches:
+				couche.utiliser_optimiseur(nom)
+		return True
+
+	def _vider_codes(self):
+
+		"""Fonction interne: oublie les représentations des classes déjà calculées (voir Reseau.codes), à appeler dès que les classes ou le codage changent"""
+
+		self._codes = None
+		self._indices = None
+
+	def indice(self, nom):
+
+		"""Renvoie l'indice de la classe 'nom' dans self.classes (sans la chercher dans la liste)"""
+
+		if self._indices is None:
+			self._indices = {classe: i for i, classe in enumerate(self.classes)}
+		return self._indices[nom]
+
+	def codes(self):
+
+		"""Renvoie la matrice (nombre de classes, taille de la sortie) des représentations de chaque classe, dans l'ordre de self.classes. Elle n'est calculée qu'une fois tant que les classes et le codage ne changent pas"""
+
+		if self._codes is None:
+			codage = Reseau.codages[self.codage]
+			self._codes = np.array([codage(self, i) for i in range(len(self.classes))], dtype = float).reshape((len(self.classes), -1))
+		return self._codes
+
 	def representation(self, classe):
 
-		"""Renvoie la représentation en sortie d'une classe (int ou string)"""
+		"""Renvoie la représentation en sortie d'une classe (indice ou nom)"""
 
-		try:
-			return Reseau.codages[self.codage](self, classe)
-		except Exception:
-			return Reseau.codages[self.codage](self, self.classes.index(classe))
+		if not isinstance(classe, (int, np.integer)):
+			classe = self.indice(classe)
+		return Reseau.codages[self.codage](self, classe)
 
 	def ajout_classe(self, nom):
 
@@ -448,11 +701,14 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 
 		if not nom in self.classes:
 			self.classes.append(nom)
+			self._vider_codes()
 			vecteur = self.representation(0) # Codage d'un vecteur quelconque, ici le premier
-			couche = [Neurone() for i in range(len(vecteur))] # La taille du vecteur donne le nombre de neurones de sortie
+			couche = Couche(len(vecteur)) # La taille du vecteur donne le nombre de neurones de sortie
 			if len(self) == 0:
 				self.append(couche)
 			else:
+				couche.utiliser_activation(self[-1].activation.nom) # La nouvelle couche de sortie garde l'activation (softmax...) et l'optimiseur de l'ancienne
+				couche.utiliser_optimiseur(self[-1].optimiseur.nom)
 				self[-1] = couche
 
 	def enlever_classe(self, nom):
@@ -461,11 +717,14 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 
 		if nom in self.classes:
 			self.classes.remove(nom)
+			self._vider_codes()
 			vecteur = self.representation(0) # Codage d'un vecteur quelconque, ici le premier
-			couche = [Neurone() for i in range(len(vecteur))] # La taille du vecteur donne le nombre de neurones de sortie
+			couche = Couche(len(vecteur)) # La taille du vecteur donne le nombre de neurones de sortie
 			if len(self) == 0:
 				self.append(couche)
 			else:
+				couche.utiliser_activation(self[-1].activation.nom) # La nouvelle couche de sortie garde l'activation (softmax...) et l'optimiseur de l'ancienne
+				couche.utiliser_optimiseur(self[-1].optimiseur.nom)
 				self[-1] = couche
 
 	def initialiser(self, taille_entree):
@@ -476,19 +735,14 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 		# On initialise la taille des neurones par récurrence: la taille d'entrée du reseau définit la taille des vecteurs d'entrée de la première couche interne, la taille de cette dernière définit la taille d'entrée de la couche suivante... etc
 		taille = taille_entree + 1
 		for couche in self:
-			for neurone in couche:
-				neurone.initialiser(taille)
+			couche.initialiser(taille)
 			taille = len(couche) + 1 # Taille + 1 pour les termes de biais
 
 	def ajout_couche(self, couche):
 
 		"""Ajoute une couche au réseau. Le paramètre 'couche' peut être indifféremment un entier (taille de la couche à ajouter) ou une liste de neurones déjà créés"""
 
-		try: # On suppose que 'couche' est un entier
-			couche = [Neurone()]*couche # On créé une couche de taille 'couche'
-		except Exception: # Un problème? C'est donc déjà une liste
-			pass
-		self.insert(-1, couche) # On ajoute avant la couche de sortie géree par le réseau de manière interne
+		self.insert(-1, Couche(couche)) # Couche accepte indifféremment un entier ou une liste de neurones # On ajoute avant la couche de sortie géree par le réseau de manière interne
 
 	def enlever_couche(self, couche):
 
@@ -511,32 +765,88 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 
 		return [couche for couche in self[:-1]]
 
-	def sortie(self, vecteur):
+	def _propager(self, vecteur):
 
-		"""Calcule la sortie de chaque couche du réseau pour une entrée vectorielle"""
+		"""Comme Reseau.sortie, mais les sorties sont des arrays numpy"""
 
-		sorties = [vecteur + [-1]] # On ajoute le terme de biais
+		sorties = [np.append(np.asarray(vecteur, dtype = float), -1)] # On ajoute le terme de biais
 		taille = len(self)
 		for couche in self:
 			# La sortie tout en haut de la liste (la dernière) est en fait l'entrée de la couche suivante
-			sortie = [neurone.sortie(sorties[-1]) for neurone in couche] 
+			sortie = couche.sortie(sorties[-1]) # Un seul produit matrice-vecteur par couche
 			if len(sorties) < taille:
-				sortie += [-1] # On ajoute le terme de biais
+				sortie = np.append(sortie, -1) # On ajoute le terme de biais
 			sorties.append(sortie)
 		return sorties
 
+	def sortie(self, vecteur):
+
+		"""Calcule la sortie de chaque couche du réseau pour une entrée vectorielle"""
+
+		return [sortie.tolist() for sortie in self._propager(vecteur)]
+
+	def sortie_lot(self, exemples):
+
+		"""Calcule la sortie du réseau pour un lot d'exemples: 'exemples' est une matrice (N, d) (un exemple par ligne), le résultat une matrice (N, k) des sorties de la dernière couche"""
+
+		sortie = np.asarray(exemples, dtype = float).reshape((len(exemples), -1))
+		for couche in self:
+			sortie = couche.sortie_lot(sortie) # Un seul produit matriciel par couche pour tout le lot
+		return sortie
+
 	def classer(self, exemple, filtre = 1):
 
 		"""Renvoie une liste de classes probables correspondant à l'exemple 'exemple', dans l'ordre décroissant de probabilité"""
 
-		sortie = np.array(self.sortie(exemple)[-1])
-		couples = []
-		for classe in self.classes:
-			rep = np.array(self.representation(classe))
-			norme = 1/2*np.linalg.norm(rep - sortie)
-			couples.append([classe, norme])
-		couples.sort(key = lambda element: element[1]) # [plus probable, ..., moins probable]
-		return [element[0] for element in couples if element[1] < filtre]
+		return self.classer_lot([exemple], filtre)[0]
+
+	def distances_lot(self, exemples):
+
+		"""Renvoie la matrice (N, nombre de classes) des distances entre la sortie du réseau pour chaque exemple et la représentation de chaque classe (dans l'ordre de self.classes).
+		Avec une sortie softmax, la "distance" à une classe est simplement 1 - probabilité de la classe"""
+
+		sorties = self.sortie_lot(exemples)
+		if self.softmax:
+			return 1 - sorties # Pas de représentation ni de norme à calculer: la sortie donne directement la probabilité de chaque classe
+		codes = self.codes()
+		# |y - c|² = |y|² + |c|² - 2 y.c: un seul produit matriciel pour toutes les classes et tout le lot
+		carres = np.sum(sorties**2, axis = 1)[:, np.newaxis] + np.sum(codes**2, axis = 1)[np.newaxis, :] - 2*sorties @ codes.T
+		return 1/2*np.sqrt(np.maximum(carres, 0)) # Pas de racine d'un nombre (très légèrement) négatif à cause des arrondis
+
+	def classer_lot(self, exemples, filtre = 1):
+
+		"""Comme Reseau.classer, pour un lot d'exemples (matrice (N, d)): renvoie une liste de classes probables par exemple"""
+
+		distances = self.distances_lot(exemples)
+		ordres = np.argsort(distances, axis = 1, kind = "stable") # [plus probable, ..., moins probable]
+		return [[self.classes[i] for i in ordre if ligne[i] < filtre] for ordre, ligne in zip(ordres.tolist(), distances.tolist())]
+
+	def decoder_lot(self, exemples):
+
+		"""Renvoie la classe la plus probable pour chaque exemple d'un lot, en décodant directement la sortie (voir Reseau.decodages) plutôt qu'en calculant la distance à chaque classe; None si la sortie ne correspond à aucune classe (codage binaire)"""
+
+		if self.codage in Reseau.decodages:
+			indices = Reseau.decodages[self.codage](self, self.sortie_lot(exemples))
+		else:
+			indices = np.argmin(self.distances_lot(exemples), axis = 1)
+		return [self.classes[i] if i < len(self.classes) else None for i in indices.tolist()]
+
+	def perte(self, resultats, sorties):
+
+		"""Renvoie l'erreur commise (sommée sur un lot, le cas échéant) pour les sorties 'sorties' quand on attendait 'resultats': l'erreur quadratique, ou l'entropie croisée avec une sortie softmax"""
+
+		resultats, sorties = np.asarray(resultats, dtype = float), np.asarray(sorties, dtype = float)
+		if self.softmax:
+			return float(-np.sum(resultats*np.log(np.maximum(sorties, 1e-300)))) # Pas de log(0)
+		return float(1/2*np.sum((resultats - sorties)**2))
+
+	def _erreur_sortie(self, sorties, resultats):
+
+		"""Fonction interne: erreur de la couche de sortie (voir Reseau.calc_erreur), pour un exemple ou un lot"""
+
+		if self.softmax: # Les dérivées de la softmax et de l'entropie croisée se simplifient
+			return resultats - sorties
+		return self.couche_sortie().activation.derivee(sorties)*(resultats - sorties)
 
 	def calc_erreur(self, sorties, resultat):
 
@@ -544,74 +854,185 @@ class Reseau(list): # On se base sur 'list' pour automatiquement avoir __iter__,
 
 		# Intérêt du générateur: les termes d'erreurs sont calculés au moment d'itérer (for _ in calc_erreur(*args)), ce qui permet un gain de temps. On ne peut mathématiquement les calculer qu'en partant de la fin néanmoins...
 
-		erreur = [n.sortie_deriv(sorties[-2])*(t-y) for n, t, y in zip(self.couche_sortie(), resultat, sorties[-1])] # Première erreur: formule différente
+		# Les dérivées sont calculées à partir des sorties de chaque couche (voir Activation): pas besoin de refaire les produits scalaires
+
+		sorties = [np.asarray(sortie, dtype = float) for sortie in sorties]
+		erreur = self._erreur_sortie(sorties[-1], np.asarray(resultat)) # Première erreur: formule différente
 		couche_suiv = self.couche_sortie()
 		sorties.pop()
 		yield erreur
 
 		for couche in reversed(self.couches_internes()):
-			retroprop = [sum(n[k]*e for n, e in zip(couche_suiv, erreur)) for k in range(len(couche))] # Terme de retropropagation
-			erreur = [n.sortie_deriv(sorties[-2])*retroprop[k] for k, n in enumerate(couche)]
+			retroprop = couche_suiv.matrice[:, :len(couche)].T @ erreur # Terme de retropropagation (on ignore la colonne des biais)
+			erreur = couche.activation.derivee(sorties[-1][:-1])*retroprop # Sans le terme de biais
 			couche_suiv = couche
 			sorties.pop()
 			yield erreur
 
 	def entrainer(self, exemple, resultat, taux_app = 0.5, inertie = 0.5):
 
-		"""Entraîne le réseau sur un exemple 'exemple' (vecteur) dont la sortie attendue est 'resultat'. Renvoie l'erreur quadratique commise par le réseau sur l'exemple avant correction"""
+		"""Entraîne le réseau sur un exemple 'exemple' (vecteur) dont la sortie attendue est 'resultat'. Renvoie l'erreur commise par le réseau sur l'exemple avant correction (voir Reseau.perte)"""
 
-		sorties = self.sortie(exemple)
+		sorties = self._propager(exemple)
 		gen_erreurs = self.calc_erreur(sorties, resultat)
 		entrees = sorties[:-1]
 
-		err = 1/2*sum((t - y)**2 for t, y in zip(resultat, sorties[-1]))
+		err = self.perte(resultat, sorties[-1])
 
 		for entree, erreurs, couche in zip(entrees[::-1], gen_erreurs, self[::-1]): # Il faut itérer à l'envers (voir Reseau.calc_erreur)
-			for erreur, neurone in zip(erreurs, couche):
-				delta = [erreur*i for i in entree]
-				neurone.corriger(delta, inertie, taux_app)
+			couche.corriger(np.outer(erreurs, entree), inertie, taux_app) # Les deltas de tous les neurones de la couche d'un coup
 
 		return err
 
-	def entrainer_cycle(self, exemples, resultats, taux_app = 0.5, inertie = 0.5, validation = True):
+	def _propager_lot(self, exemples):
+
+		"""Fonction interne: propage un lot d'exemples (matrice (N, d)) dans le réseau, et renvoie la liste des sorties de chaque couche (la première étant l'entrée du réseau, sans colonne de biais)"""
 
-		"""Entraîne le réseau sur un ensemble d'exemples dont les sorties attendues sont données dans 'resultats'. La fonction renvoie un itérateur (pouvant être arrêté par un 'break' par exemple), qui donne l'erreur moyenne et l'erreur de validation (ou 0 si cette dernière n'est pas disponible) à chaque cycle de correction"""
+		sorties = [np.asarray(exemples, dtype = float).reshape((len(exemples), -1))]
+		for couche in self:
+			sorties.append(couche.sortie_lot(sorties[-1]))
+		return sorties
+
+	def _gradients_lot(self, exemples, resultats):
+
+		"""Fonction interne: calcule les corrections à apporter à chaque couche pour un lot d'exemples (matrice (N, d)) dont les sorties attendues sont données dans 'resultats' (matrice (N, k)). Renvoie la somme des erreurs (voir Reseau.perte) et la liste des corrections sommées sur le lot (non moyennées), en partant de la couche de sortie"""
+
+		resultats = np.asarray(resultats, dtype = float).reshape((len(resultats), -1))
+		sorties = self._propager_lot(exemples)
+
+		err = self.perte(resultats, sorties[-1])
+
+		# Erreurs de chaque couche pour tout le lot, en partant de la fin: les dérivées sont calculées à partir des sorties de la propagation (pas de nouveau produit scalaire)
+		erreur = self._erreur_sortie(sorties[-1], resultats)
+		deltas = []
+		for c in range(len(self)-1, -1, -1):
+			couche = self[c]
+			delta = np.empty_like(couche.matrice)
+			delta[:, :-1] = erreur.T @ sorties[c] # sorties[c] est l'entrée de la couche c
+			delta[:, -1] = -erreur.sum(axis = 0) # Entrée du biais: -1
+			deltas.append(delta)
+			if c > 0:
+				erreur = self[c-1].activation.derivee(sorties[c])*(erreur @ couche.poids) # Retropropagation, avec les poids d'avant correction
+
+		return err, deltas
 
-		liste = list(zip(exemples, resultats))
-		random.shuffle(liste) # On mélange les exemples pour éviter au réseau de trop se focaliser sur une classe en particulier. On peut se permettre de ne mélanger qu'une fois en théorie, il y a peu de chances que le réseau se focalise sur le cycle
-		liste_validation = [] # Couples de validation: ne sont pas utilisés pour l'entraînement, seulement pour tester l'évolution de l'erreur et s'assurer que le réseau ne se focalise pas trop sur les exemples d'entraînement
+	def corriger_lot(self, deltas, n, taux_app = 0.5, inertie = 0.5):
 
-		if validation: # Si on veut l'erreur de validation aussi
+		"""Corrige chaque couche avec le gradient moyen d'un lot de 'n' exemples, 'deltas' étant les corrections sommées sur le lot (voir Reseau._gradients_lot)"""
 
-			classes_vues = []
-			for classe in resultats:
-				if not classe in classes_vues: # On ne prend qu'un échantillon par classe
-					classes_vues.append(classe)
-					ex_classe = [] # On rassemble les couples ayant la même classe/même résultat
-					for ex, res in liste:
-						if res == classe:
-							ex_classe.append((ex, res))
-					if len(ex_classe) > 1:
-						# liste_validation.append(random.choice(ex_classe))
-						liste_validation.append(ex_classe[0])
+		for couche, delta in zip(self[::-1], deltas):
+			couche.corriger(delta/n, inertie, taux_app) # Même inertie qu'en ligne: la dernière correction est répétée à un facteur près
 
-			liste = [couple for couple in liste if couple not in liste_validation] # Couples gardés pour la validation
+	def entrainer_lot(self, exemples, resultats, taux_app = 0.5, inertie = 0.5):
 
-		while 1: # C'est normal, tout va bien
+		"""Entraîne le réseau sur un lot d'exemples (matrice (N, d)) dont les sorties attendues sont données dans 'resultats' (matrice (N, k)): les poids sont corrigés une seule fois, avec le gradient moyen du lot. Renvoie la somme des erreurs commises sur chaque exemple avant correction (voir Reseau.perte)"""
 
-			err = 0
-			for exemple, resultat in liste: # Pour chaque exemple
-				err += self.entrainer(exemple, resultat, taux_app = taux_app, inertie = inertie)
-			err = err/len(liste) # Moyenne algébrique des erreurs pour chaque exemple
+		err, deltas = self._gradients_lot(exemples, resultats)
+		self.corriger_lot(deltas, len(resultats), taux_app = taux_app, inertie = inertie)
+		return err
+
+	def separer_validation(resultats, ordre, validation = True):
+
+		"""Sépare les indices 'ordre' (déjà mélangés) des exemples en indices d'entraînement et indices de validation, classe par classe (même résultat attendu), en une seule passe.
+		'validation' vaut True pour garder un exemple par classe (si la classe en a plusieurs), une proportion (ex: 0.2) pour garder cette part des exemples de chaque classe (au moins un, sans jamais prendre tous les exemples d'une classe), ou False pour ne rien garder"""
+
+		ordre = np.asarray(ordre, dtype = int)
+		if not validation or len(ordre) == 0:
+			return ordre, ordre[:0]
+
+		resultats = np.ascontiguousarray(resultats, dtype = float).reshape((len(resultats), -1))
+		lignes = resultats.view(np.dtype((np.void, resultats.shape[1]*resultats.itemsize))).reshape(-1) # Chaque ligne vue comme un seul bloc d'octets: np.unique est bien plus rapide qu'avec axis = 0
+		_, classes = np.unique(lignes, return_inverse = True) # Numéro de classe de chaque exemple
+		classes = classes.reshape(-1)[ordre]
+		effectifs = np.bincount(classes)
+
+		if validation is True:
+			nb_validation = np.minimum(effectifs - 1, 1)
+		else:
+			nb_validation = np.minimum(effectifs - 1, np.maximum(np.round(validation*effectifs), 1)).astype(int)
+
+		# Rang de chaque exemple au sein de sa classe, dans l'ordre du mélange: on garde les premiers de chaque classe pour la validation
+		tri = np.argsort(classes, kind = "stable")
+		rangs = np.empty(len(ordre), dtype = int)
+		rangs[tri] = np.arange(len(ordre)) - np.repeat(np.cumsum(effectifs) - effectifs, effectifs)
+		gardes = rangs < nb_validation[classes]
+
+		return ordre[~gardes], ordre[gardes]
+
+	def entrainer_cycle(self, exemples, resultats, taux_app = 0.5, inertie = 0.5, validation = True, taille_lot = None, processus = None, melanger = False, patience = None, meilleur = False, reprise = None, periode = 10, calendrier = None):
+
+		"""Entraîne le réseau sur un ensemble d'exemples dont les sorties attendues sont données dans 'resultats'. La fonction renvoie un itérateur (pouvant être arrêté par un 'break' par exemple), qui donne l'erreur moyenne et l'erreur de validation (ou 0 si cette dernière n'est pas disponible) à chaque cycle de correction.
+		'validation' vaut True (un exemple de validation par classe), False, ou la proportion des exemples de chaque classe gardée pour la validation (voir Reseau.separer_validation).
+		Si 'taille_lot' est précisée, l'entraînement se fait par lots de cette taille (voir Reseau.entrainer_lot) plutôt qu'exemple par exemple.
+		Si 'processus' est précisé, chaque lot est réparti entre ce nombre de processus (voir EntrainementParallele), par défaut par lots de 32 exemples par processus.
+		Avec 'melanger', l'ordre des exemples d'entraînement est à nouveau mélangé à chaque cycle.
+		Si 'patience' est précisée, l'entraînement s'arrête de lui-même après ce nombre de cycles sans amélioration de l'erreur de validation (ou de l'erreur moyenne, sans validation). Dans ce cas, ou avec 'meilleur', les poids ayant donné la plus petite erreur sont remis dans le réseau à la fin de l'entraînement, y compris s'il est interrompu.
+		Si 'reprise' est précisé (chemin d'un fichier), l'état de l'entraînement y est sauvé tous les 'periode' cycles (voir PointReprise); si ce fichier existe déjà, l'entraînement reprend là où il s'était arrêté, sans avoir à initialiser le réseau.
+		Les poids sont corrigés selon l'optimiseur de chaque couche (voir Reseau.utiliser_optimiseur). Un 'calendrier' (voir calendrier_palier par exemple) fait varier le taux d'apprentissage au fil des cycles"""
+
+		# On ne manipule que des indices: les exemples ne sont jamais copiés ni comparés entre eux
+		exemples = np.asarray(exemples, dtype = float).reshape((len(exemples), -1))
+		resultats = np.asarray(resultats, dtype = float).reshape((len(resultats), -1))
+
+		if reprise is not None and os.path.exists(reprise): # Entraînement interrompu: on reprend les poids, l'inertie, l'ordre des exemples...
+			etat = PointReprise()
+			etat.charger(reprise)
+			etat.restaurer(self, len(exemples))
+		else:
+			ordre = list(range(len(exemples)))
+			random.shuffle(ordre) # On mélange les exemples pour éviter au réseau de trop se focaliser sur une classe en particulier
+			# Exemples de validation: ne sont pas utilisés pour l'entraînement, seulement pour tester l'évolution de l'erreur et s'assurer que le réseau ne se focalise pas trop sur les exemples d'entraînement
+			etat = PointReprise(*Reseau.separer_validation(resultats, ordre, validation))
+		entrainement = etat.entrainement
+		val_exemples, val_resultats = exemples[etat.validation], resultats[etat.validation]
+		garder = meilleur or patience is not None # Faut-il garder une copie des meilleurs poids?
+
+		parallele = None
+		if processus is not None: # Les exemples et les poids sont placés en mémoire partagée pour les processus
+			parallele = EntrainementParallele(self, exemples, resultats, processus = processus)
+			if taille_lot is None:
+				taille_lot = 32*parallele.processus
 
-			err_val = 0
-			for exemple, resultat in liste_validation:
-				sortie = self.sortie(exemple)[-1] # On calcule l'erreur pour les couples de validation
-				err_val += 1/2*sum([(r - s)**2 for r, s in zip(resultat, sortie)])
-			if len(liste_validation):
-				err_val = err_val/len(liste_validation)
+		try:
 
-			yield err, err_val
+			while 1: # C'est normal, tout va bien
+
+				if melanger:
+					random.shuffle(entrainement) # Seule la permutation des indices est mélangée
+				taux = taux_app if calendrier is None else taux_app*calendrier(etat.cycle)
+
+				err = 0
+				if parallele is not None:
+					for i in range(0, len(entrainement), taille_lot): # Pour chaque lot, réparti entre les processus
+						err += parallele.entrainer_lot(entrainement[i:i+taille_lot], taux_app = taux, inertie = inertie)
+				elif taille_lot is None:
+					for i in entrainement: # Pour chaque exemple
+						err += self.entrainer(exemples[i], resultats[i], taux_app = taux, inertie = inertie)
+				else:
+					for i in range(0, len(entrainement), taille_lot): # Pour chaque lot
+						lot = entrainement[i:i+taille_lot]
+						err += self.entrainer_lot(exemples[lot], resultats[lot], taux_app = taux, inertie = inertie)
+				err = err/len(entrainement) # Moyenne algébrique des erreurs pour chaque exemple
+
+				err_val = 0
+				if len(val_exemples):
+					sorties = self.sortie_lot(val_exemples) # On calcule l'erreur pour les exemples de validation, en un seul lot
+					err_val = self.perte(val_resultats, sorties)/len(val_exemples)
+
+				attente = etat.noter(self, err_val if len(val_exemples) else err, copier = garder)
+				if reprise is not None and etat.cycle % periode == 0:
+					etat.sauver(reprise, self)
+
+				yield err, err_val
+
+				if patience is not None and attente >= patience: # Arrêt anticipé: l'erreur ne diminue plus
+					return
+
+		finally: # Appelé aussi quand l'itérateur est abandonné (après un 'break' par exemple)
+			if garder:
+				etat.restaurer_meilleurs(self)
+			if parallele is not None:
+				parallele.fermer()
 
 def heaviside(x):
 	return 1 if x > 0 else 0
@@ -620,179 +1041,1065 @@ def heaviside_prime(x):
 	return float("inf") if x == 0 else 0
 
 def sigmoide(x):
-	return 1/(1+math.exp(-x))
+	with np.errstate(over = "ignore"): # exp(-x) peut dépasser pour x très négatif, la sortie vaut alors 0 comme il se doit
+		return 1/(1+np.exp(-x)) # Fonctionne aussi sur des arrays numpy
 
 def sigmoide_prime(x):
-	return sigmoide(x)*(1-sigmoide(x))
+	s = sigmoide(x)
+	return s*(1-s)
 
-class Neurone(list):
+def tanh(x):
+	return np.tanh(x)
 
-	"""Un neurone pour les réseaux"""
+def relu(x):
+	return np.maximum(x, 0)
 
-	def __str__(self):
+def softmax(x):
+	e = np.exp(x - np.max(x, axis = -1, keepdims = True)) # On retranche le maximum pour éviter les dépassements, le résultat est le même
+	return e/np.sum(e, axis = -1, keepdims = True) # Normalisation de chaque vecteur (ou de chaque ligne d'une matrice)
 
-		return "Neurone({})".format(", ".join([str(i) for i in self]))
+def interpolation(fonction, debut, fin, pts = 1000):
 
-	def __repr__(self): return self.__str__()
+	"""Renvoie une approximation (vectorisée) de 'fonction' par une table de 'pts' valeurs précalculées sur [debut, fin]: interpolation linéaire entre deux points de la table, valeurs des extrémités en dehors"""
 
-	def __init__(self, poids = None):
+	abscisses = np.linspace(debut, fin, pts)
+	table = fonction(abscisses)
 
-		"""Créer un neurone, initialise aux poids 'poids' si fournis"""
+	def approximation(x):
+		return np.interp(x, abscisses, table) # Recherche dans la table et interpolation, en une fois
 
-		self.delta_prec = None
-		# Fonction d'activation: un sigmoide + dérivée
-		self.activation = sigmoide #interpolation(sigmoide, -5, 5, pts = 1000)
-		self.activation_deriv = sigmoide_prime #interpolation(sigmoide_prime, -5, 5, pts = 1000)
+	return approximation
 
-		# Si on fournit des poids au moment de la création
-		if poids is not None:
-			self.initialiser(len(poids)) # On initialise à la bonne taille
-			self.corriger(poids, inertie = 0, taux_app = 1) # Et on corrige (petite astuce pour éviter d'écrire "manuellement" les poids!)
 
-	def corriger(self, delta, inertie = 0.5, taux_app = 0.5):
+class Activation:
 
-		"""Corrige les poids du neurone avec une liste de deltas à appliquer à chaque poids. L'inertie répète la dernière correction è un facteur près"""
+	"""Une fonction d'activation (vectorisée) et sa dérivée. La dérivée est exprimée en fonction de la sortie de l'activation, déjà calculée lors de la propagation: pas besoin de refaire le calcul"""
 
-		for i, poids in enumerate(self):
-			self[i] = poids + taux_app*delta[i] + inertie*self.delta_prec[i]
-		self.delta_prec = delta
+	def __init__(self, nom, fonction, derivee):
 
-	def sortie(self, vecteur):
+		self.nom = nom
+		self.fonction = fonction
+		self.derivee = derivee # derivee(y) = f'(x) où y = f(x)
 
-		"""Sortie d'un neurone pour le vecteur 'vecteur'"""
+	def __call__(self, x):
 
-		assert len(vecteur) == len(self)
-		return self.activation(np.dot(vecteur, self)) # Produit scalaire des poids avec le vecteur, puis sigmoide
+		return self.fonction(x)
 
-	def sortie_deriv(self, vecteur):
+	def deriv(self, x):
 
-		"""Sortie derivée d'un neurone pour le vecteur 'vecteur'"""
+		"""Dérivée en x (si la sortie n'est pas déjà connue)"""
 
-		assert len(vecteur) == len(self)
-		return self.activation_deriv(np.dot(vecteur, self))
+		return self.derivee(self.fonction(x))
 
-	def initialiser(self, taille):
+	def __repr__(self): return "Activation(" + self.nom + ")"
 
-		"""Initialise le neurone à la taille 'taille' avec des valeurs aléatoires"""
+# Règles de correction des poids d'une couche (voir Optimiseur). 'delta' est la correction calculée par la rétropropagation (l'opposé du gradient de l'erreur), qu'on ajoute aux poids
 
-		self.delta_prec = []
-		del self[:]
-		for i in range(taille):
-			self.delta_prec.append(0)
-			self.append(random.uniform(-0.5, 0.5)) # Initialisation avec de petites valeurs aleatoires
+def correction_inertie(couche, delta, taux_app, inertie):
+	np.add(couche.matrice, taux_app*delta, out = couche.matrice) # Modifications en place: les neurones restent des vues sur la matrice
+	np.add(couche.matrice, inertie*couche.delta_prec, out = couche.matrice) # La dernière correction est répétée à un facteur près
 
+def correction_nesterov(couche, delta, taux_app, inertie):
+	vitesse = couche.moments[0]
+	vitesse *= inertie
+	vitesse += taux_app*delta
+	np.add(couche.matrice, inertie*vitesse + taux_app*delta, out = couche.matrice) # On corrige "en avance", avec la vitesse mise à jour
 
-# Protocoles de lecture et écriture de réseaux OCR
+def correction_rmsprop(couche, delta, taux_app, inertie, rho = 0.9, epsilon = 1e-8):
+	carres = couche.moments[0] # Moyenne glissante des carrés des corrections
+	carres *= rho
+	carres += (1-rho)*delta**2
+	np.add(couche.matrice, taux_app*delta/(np.sqrt(carres) + epsilon), out = couche.matrice)
 
-class ProtocoleJSON:
+def correction_adam(couche, delta, taux_app, inertie, beta1 = 0.9, beta2 = 0.999, epsilon = 1e-8):
+	couche.iterations += 1
+	moyenne, carres = couche.moments # Moyennes glissantes des corrections et de leurs carrés
+	moyenne *= beta1
+	moyenne += (1-beta1)*delta
+	carres *= beta2
+	carres += (1-beta2)*delta**2
+	t = couche.iterations # Les moyennes partent de 0: on corrige ce biais
+	np.add(couche.matrice, taux_app*(moyenne/(1-beta1**t))/(np.sqrt(carres/(1-beta2**t)) + epsilon), out = couche.matrice)
 
-	"""Protocole pour le format JSON"""
 
-	def __init__(self, chemin, mode):
+class Optimiseur:
 
-		modes = { "r": "r", "w": "w+" } # Modes "r" ou "w" uniquement
-		self.fichier = open(chemin, modes.get(mode, "r"))
-		try: # On essaye de charger un fichier
-			self.donnees = json.load(self.fichier)
-		except Exception as e: # Si ça ne marche pas, on initialise le futur fichier
-			self.donnees = { "echantillons": {} }
+	"""Une règle de correction des poids d'une couche (voir Couche.corriger). Elle dispose pour chaque couche de 'nb_moments' matrices de la taille des poids pour garder son état (moyennes glissantes, vitesse...), rangées dans Couche.moments"""
 
-	def __enter__(self): # Appelé par le mot-clé "with"
+	def __init__(self, nom, nb_moments, regle):
 
-		return self
+		self.nom = nom
+		self.nb_moments = nb_moments
+		self.regle = regle # regle(couche, delta, taux_app, inertie), modifie couche.matrice et couche.moments en place
 
-	def __exit__(self, *args): # Appelé en sortant d'un bloc "with"
+	def __call__(self, couche, delta, taux_app, inertie):
 
-		self.fichier.close()
+		self.regle(couche, delta, taux_app, inertie)
 
-	def sauver(self, reseau):
+	def __repr__(self): return "Optimiseur(" + self.nom + ")"
 
-		"""Sauve un réseau dans un fichier"""
+# Calendriers du taux d'apprentissage (voir Reseau.entrainer_cycle): fonctions qui au numéro du cycle (à partir de 0) associent le facteur appliqué au taux d'apprentissage
 
-		donnees = reseau._export() # On génère les données de base
-		donnees["echantillons"] = {}
+def calendrier_palier(facteur = 0.5, periode = 100):
 
-		# On convertit les images en texte, elles sont encodées en base 64
-		for classe in reseau.classes:
-			donnees["echantillons"][classe] = images_base64 = []
-			for image in reseau.fichiers(classe):
-				image_base64 = base64.b64encode(image.getvalue())
-				images_base64.append(image_base64.decode("utf-8"))
+	"""Le taux d'apprentissage est multiplié par 'facteur' tous les 'periode' cycles"""
 
-		json.dump(donnees, self.fichier)
+	def calendrier(cycle):
+		return facteur**(cycle//periode)
 
-	def images(self):
+	return calendrier
 
-		"""Itérateur sur les images contenues dans le fichier"""
+def calendrier_exponentiel(facteur = 0.99):
 
-		# Itérateur car le décodage peut être long
+	"""Le taux d'apprentissage est multiplié par 'facteur' à chaque cycle"""
 
-		for classe, images_base64 in self.donnees["echantillons"].items():
-			for image_base64 in images_base64:
-				image = io.BytesIO(base64.b64decode(image_base64)) # On décode chacune des images dans un fichier mémoire (BytesIO)
-				image = ImageBinaire.open(image)
-				yield classe, image
+	def calendrier(cycle):
+		return facteur**cycle
 
-	def reseau(self):
+	return calendrier
 
-		"""Renvoie les données brutes du réseau (pas d'échantillons)"""
+def calendrier_cosinus(cycles, minimum = 0.0):
 
-		donnees = self.donnees.copy()
-		del donnees["echantillons"]
-		return donnees
+	"""Le taux d'apprentissage décroît en demi-cosinus jusqu'à 'minimum' (facteur) en 'cycles' cycles, puis reste au minimum"""
 
-class ProtocoleZIP:
+	def calendrier(cycle):
+		return minimum + (1-minimum)*(1 + math.cos(math.pi*min(cycle, cycles)/cycles))/2
 
-	"""Protocole pour les fichiers ZIP"""
+	return calendrier
 
-	def __init__(self, chemin, mode):
+class Couche(list):
 
-		modes = { "r": "r", "w": "w" }
-		self.fichier = zipfile.ZipFile(io.StringIO(chemin).getvalue(), modes.get(mode, "r"))
+	"""Une couche de neurones. Les poids de tous les neurones sont rangés dans une seule matrice (une ligne par neurone, la dernière colonne contenant les poids des biais), les objets Neurone de la liste ne sont que des vues sur cette matrice"""
 
-	def __enter__(self):
+	def __init__(self, neurones = 0):
 
-		return self
+		"""Créer une couche à partir d'une liste de neurones, ou d'un entier (nombre de neurones à créer)"""
 
-	def __exit__(self, *args):
+		try: # On suppose que 'neurones' est un entier
+			neurones = [Neurone() for i in range(neurones)]
+		except Exception: # Un problème? C'est donc déjà une liste
+			uniques = []
+			for neurone in neurones:
+				if any(neurone is n for n in uniques): # Un même neurone ne peut pas être une vue sur deux lignes: on le copie
+					neurone = Neurone(list(neurone))
+				uniques.append(neurone)
+			neurones = uniques
+		list.__init__(self, neurones)
+
+		self.activation = Couche.activations["sigmoide"] # Fonction d'activation, appliquée à toute la couche (voir Couche.activations)
+		self.optimiseur = Couche.optimiseurs["inertie"] # Règle de correction des poids (voir Couche.optimiseurs)
+		self.moments = None
+
+		tailles = set(len(neurone) for neurone in self)
+		if len(tailles) == 1: # On rassemble les poids des neurones dans une matrice
+			self._lier(np.array([neurone.poids for neurone in self], dtype = float), np.array([neurone.delta_prec for neurone in self], dtype = float))
+		else: # Neurones non initialisés (ou de tailles différentes): il faudra initialiser la couche
+			self._lier(np.zeros((len(self), 0)), np.zeros((len(self), 0)))
+
+	activations = {
+		"sigmoide": Activation("sigmoide", sigmoide, lambda y: y*(1-y)),
+		"sigmoide_table": Activation("sigmoide_table", interpolation(sigmoide, -8, 8, pts = 1000), lambda y: y*(1-y)), # Sigmoide approchée par une table de valeurs
+		"tanh": Activation("tanh", tanh, lambda y: 1-y**2),
+		"relu": Activation("relu", relu, lambda y: (y > 0).astype(float)),
+		"softmax": Activation("softmax", softmax, lambda y: y*(1-y)), # Couche de sortie uniquement (voir Reseau.utiliser_softmax): avec l'entropie croisée, cette dérivée n'est pas utilisée
+	}
 
-		self.fichier.close()
+	optimiseurs = {
+		"inertie": Optimiseur("inertie", 0, correction_inertie), # Comportement historique: taux d'apprentissage fixe et inertie
+		"nesterov": Optimiseur("nesterov", 1, correction_nesterov),
+		"rmsprop": Optimiseur("rmsprop", 1, correction_rmsprop),
+		"adam": Optimiseur("adam", 2, correction_adam),
+	}
 
-	def sauver(self, reseau):
+	def utiliser_activation(self, nom):
 
-		"""Sauve un réseau dans un fichier"""
+		"""Indique quelle fonction d'activation utiliser pour la couche. Renvoie False si la fonction est inconnue!"""
 
-		donnees = reseau._export()
-		self.fichier.writestr("reseau.json", json.dumps(donnees)) # Les données textes sont sauvées dans un fichier JSON, placé dans le ZIP
+		if nom in Couche.activations:
+			self.activation = Couche.activations[nom]
+			return True
+		else:
+			return False
 
-		for classe in reseau.classes:
-			for index, image in enumerate(reseau.fichiers(classe)): # Les images sont sauvées a part
-				if classe == "/": classe = "__slash__" # On renomme l'éventuelle classe "/" qui va causer des bugs...
-				self.fichier.writestr(classe+"/"+str(index)+".png", image.getvalue())
+	def utiliser_optimiseur(self, nom):
 
-	def images(self):
+		"""Indique quelle règle de correction des poids utiliser pour la couche (son état est remis à zéro). Renvoie False si la règle est inconnue!"""
 
-		"""Itérateur sur les images contenues dans le fichier"""
+		if nom in Couche.optimiseurs:
+			self.optimiseur = Couche.optimiseurs[nom]
+			self.vider_moments()
+			return True
+		else:
+			return False
 
-		for nom in self.fichier.namelist(): # On itère sur les fichiers/dossiers, le ZIP contient des dossiers nommés selon les classes
-			if "/" in nom and not nom.endswith("/"): # Le nom comporte "/" dans son nom, donc il est dans un dossier, et c'est bien un fichier car son nom ne termine pas par un "/"
-				classe, vrai_nom = nom.split("/") # classe = nom du dossier, vrai_nom = nom du fichier
-				if classe == "__slash__": classe = "/"
-				image = self.fichier.read(nom)
-				image = io.BytesIO(image) # Encore une fois, on ouvre en mémoire
-				image = ImageBinaire.open(image) # Dernière étape: on créé une image binaire à partir du fichier mémoire!
-				yield classe, image
+	def vider_moments(self):
 
-	def reseau(self):
+		"""Remet à zéro l'état de l'optimiseur de la couche"""
 
-		"""Renvoie les données brutes du réseau (pas d'échantillons)"""
+		self.moments = np.zeros((self.optimiseur.nb_moments, ) + self.matrice.shape) # Un seul array pour tout l'état de la couche
+		self.iterations = 0 # Nombre de corrections (pour Adam)
 
-		donnees = self.fichier.open("reseau.json")
-		donnees = io.TextIOWrapper(donnees) # On ouvre en mémoire
+	def depuis(couche):
+
+		"""Renvoie 'couche' si c'est déjà un objet Couche, sinon convertit la liste de neurones en Couche"""
+
+		return couche if isinstance(couche, Couche) else Couche(couche)
+
+	def _lier(self, matrice, delta_prec):
+
+		"""Fonction interne: utilise 'matrice' comme poids de la couche, et fait de chaque neurone une vue sur sa ligne"""
+
+		self.matrice = matrice
+		self.delta_prec = delta_prec # Dernière correction appliquée à chaque poids (voir Couche.corriger)
+		for neurone, poids, delta in zip(self, matrice, delta_prec):
+			neurone.poids = poids
+			neurone.delta_prec = delta
+			neurone.couche = self
+		if self.moments is None or self.moments.shape[1:] != matrice.shape: # Poids de même forme (mémoire partagée...): l'état de l'optimiseur est gardé
+			self.vider_moments()
+
+	@property
+	def poids(self):
+
+		"""Poids des neurones (vue sur la matrice, sans les biais)"""
+
+		return self.matrice[:, :-1]
+
+	@property
+	def biais(self):
+
+		"""Poids des biais de chaque neurone (vue sur la matrice)"""
+
+		return self.matrice[:, -1]
+
+	def initialiser(self, taille):
+
+		"""Initialise chaque neurone de la couche à la taille 'taille' avec des valeurs aléatoires"""
+
+		matrice = [[random.uniform(-0.5, 0.5) for i in range(taille)] for neurone in self] # Initialisation avec de petites valeurs aleatoires, neurone par neurone comme auparavant
+		self._lier(np.array(matrice).reshape((len(self), taille)), np.zeros((len(self), taille)))
+		self.vider_moments()
+
+	def corriger(self, delta, inertie = 0.5, taux_app = 0.5):
+
+		"""Corrige les poids de toute la couche avec une matrice de deltas, selon la règle de l'optimiseur de la couche (par défaut, comme Neurone.corriger)"""
+
+		self.optimiseur(self, delta, taux_app, inertie)
+		self.delta_prec[...] = delta
+
+	def sortie(self, vecteur):
+
+		"""Sortie de chaque neurone de la couche pour le vecteur 'vecteur' (biais compris)"""
+
+		return self.activation(self.matrice @ vecteur)
+
+	def sortie_deriv(self, vecteur):
+
+		"""Sortie derivée de chaque neurone de la couche pour le vecteur 'vecteur'"""
+
+		return self.activation.deriv(self.matrice @ vecteur)
+
+	def sortie_lot(self, entrees):
+
+		"""Sortie de la couche pour un lot d'entrées (matrice (N, m), sans la colonne des biais): matrice (N, n)"""
+
+		return self.activation(entrees @ self.poids.T - self.biais) # L'entrée du biais vaut -1
+
+
+class Neurone:
+
+	"""Un neurone pour les réseaux. Il se comporte comme une liste de poids (le dernier étant celui du biais), qui est une vue sur une ligne de la matrice de sa couche (voir Couche)"""
+
+	def __str__(self):
+
+		return "Neurone({})".format(", ".join([str(i) for i in self]))
+
+	def __repr__(self): return self.__str__()
+
+	def __init__(self, poids = None):
+
+		"""Créer un neurone, initialise aux poids 'poids' si fournis"""
+
+		self.poids = np.zeros(0)
+		self.delta_prec = np.zeros(0)
+		self.couche = None # La couche dont le neurone fait partie (voir Couche._lier): c'est elle qui donne la fonction d'activation
+
+		# Si on fournit des poids au moment de la création
+		if poids is not None:
+			self.poids = np.array(poids, dtype = float)
+			self.delta_prec = np.zeros(len(self.poids))
+
+	@property
+	def activation(self):
+
+		"""Fonction d'activation du neurone: celle de sa couche (voir Couche.activations), une sigmoide s'il n'appartient à aucune couche"""
+
+		return Couche.activations["sigmoide"] if self.couche is None else self.couche.activation
+
+	# Comportement de liste, sur les poids
+
+	def __len__(self):
+
+		return len(self.poids)
+
+	def __iter__(self):
+
+		return iter(self.poids.tolist())
+
+	def __getitem__(self, i):
+
+		return self.poids[i].tolist()
+
+	def __setitem__(self, i, valeur):
+
+		self.poids[i] = valeur
+
+	def corriger(self, delta, inertie = 0.5, taux_app = 0.5):
+
+		"""Corrige les poids du neurone avec une liste de deltas à appliquer à chaque poids. L'inertie répète la dernière correction è un facteur près"""
+
+		np.add(self.poids, taux_app*np.asarray(delta), out = self.poids) # Modification en place, le neurone peut être une vue sur une couche
+		np.add(self.poids, inertie*self.delta_prec, out = self.poids)
+		self.delta_prec[...] = delta
+
+	def sortie(self, vecteur):
+
+		"""Sortie d'un neurone pour le vecteur 'vecteur'"""
+
+		assert len(vecteur) == len(self)
+		if self.activation.nom == "softmax": # La sortie dépend alors de tous les neurones de la couche
+			return self.couche.sortie(vecteur)[self.couche.index(self)]
+		return self.activation(np.dot(vecteur, self.poids)) # Produit scalaire des poids avec le vecteur, puis activation
+
+	def sortie_deriv(self, vecteur):
+
+		"""Sortie derivée d'un neurone pour le vecteur 'vecteur'"""
+
+		return self.activation.derivee(self.sortie(vecteur)) # Comme Couche.sortie_deriv: la dérivée s'exprime en fonction de la sortie
+
+	def initialiser(self, taille):
+
+		"""Initialise le neurone à la taille 'taille' avec des valeurs aléatoires"""
+
+		self.poids = np.array([random.uniform(-0.5, 0.5) for i in range(taille)]) # Initialisation avec de petites valeurs aleatoires
+		self.delta_prec = np.zeros(taille)
+
+
+# État d'un entraînement, pour l'arrêt anticipé et la reprise
+
+class PointReprise:
+
+	"""L'état d'un entraînement en cours (voir Reseau.entrainer_cycle): ordre des exemples d'entraînement et de validation, nombre de cycles effectués, meilleure erreur et meilleurs poids obtenus.
+	Sauvé régulièrement (au format JSON) avec les poids, l'inertie (delta_prec) et l'état de l'optimiseur de chaque couche et l'état du générateur aléatoire, il permet de reprendre un entraînement interrompu exactement là où il s'était arrêté"""
+
+	def __init__(self, entrainement = [], validation = []):
+
+		self.entrainement = [int(i) for i in entrainement] # Indices des exemples, dans l'ordre d'entraînement
+		self.validation = [int(i) for i in validation]
+		self.cycle = 0
+		self.meilleure_erreur = float("inf")
+		self.meilleurs = None # Poids et inertie de chaque couche pour la meilleure erreur
+		self.attente = 0 # Nombre de cycles sans amélioration
+		self.couches = None # Poids et inertie de chaque couche au moment de la sauvegarde (voir PointReprise.charger)
+		self.optimiseurs = [] # Nom et état de l'optimiseur de chaque couche au moment de la sauvegarde
+		self.hasard = None # État du générateur aléatoire au moment de la sauvegarde
+
+	def noter(self, reseau, erreur, copier = True):
+
+		"""Note l'erreur d'un cycle terminé. Si c'est la meilleure jusqu'ici, les poids du réseau sont copiés (avec 'copier'). Renvoie le nombre de cycles sans amélioration"""
+
+		self.cycle += 1
+		if erreur < self.meilleure_erreur:
+			self.meilleure_erreur = erreur
+			self.attente = 0
+			if copier:
+				self.meilleurs = [(couche.matrice.copy(), couche.delta_prec.copy()) for couche in reseau]
+		else:
+			self.attente += 1
+		return self.attente
+
+	def restaurer_meilleurs(self, reseau):
+
+		"""Remet dans le réseau les poids (et l'inertie) ayant donné la plus petite erreur"""
+
+		if self.meilleurs is not None:
+			for couche, (matrice, delta_prec) in zip(reseau, self.meilleurs):
+				couche.matrice[...] = matrice # En place: les neurones restent des vues sur la matrice
+				couche.delta_prec[...] = delta_prec
+
+	def sauver(self, chemin, reseau):
+
+		"""Sauve l'état de l'entraînement et du réseau 'reseau' dans le fichier 'chemin'. Le fichier est d'abord écrit à côté puis renommé: un entraînement tué pendant la sauvegarde laisse le point de reprise précédent intact"""
+
+		donnees = {
+			"cycle": self.cycle,
+			"entrainement": self.entrainement,
+			"validation": self.validation,
+			"meilleure_erreur": self.meilleure_erreur,
+			"attente": self.attente,
+			"meilleurs": None if self.meilleurs is None else [(matrice.tolist(), delta_prec.tolist()) for matrice, delta_prec in self.meilleurs],
+			"couches": [(couche.matrice.tolist(), couche.delta_prec.tolist()) for couche in reseau],
+			"optimiseurs": [(couche.optimiseur.nom, couche.moments.tolist(), couche.iterations) for couche in reseau],
+			"hasard": random.getstate(),
+		}
+		with open(chemin + ".tmp", "w+") as fichier:
+			json.dump(donnees, fichier)
+		os.replace(chemin + ".tmp", chemin)
+
+	def charger(self, chemin):
+
+		"""Charge un état sauvé avec PointReprise.sauver (voir PointReprise.restaurer pour l'appliquer à un réseau)"""
+
+		with open(chemin, "r") as fichier:
+			donnees = json.load(fichier)
+		self.cycle = donnees["cycle"]
+		self.entrainement = donnees["entrainement"]
+		self.validation = donnees["validation"]
+		self.meilleure_erreur = donnees["meilleure_erreur"]
+		self.attente = donnees["attente"]
+		if donnees["meilleurs"] is not None:
+			self.meilleurs = [(np.array(matrice, dtype = float), np.array(delta_prec, dtype = float)) for matrice, delta_prec in donnees["meilleurs"]]
+		self.couches = [(np.array(matrice, dtype = float), np.array(delta_prec, dtype = float)) for matrice, delta_prec in donnees["couches"]]
+		self.optimiseurs = [(nom, np.array(moments, dtype = float), iterations) for nom, moments, iterations in donnees.get("optimiseurs", [])]
+		version, etat, gauss = donnees["hasard"] # JSON a transformé les tuples en listes
+		self.hasard = (version, tuple(etat), gauss)
+
+	def restaurer(self, reseau, nb_exemples):
+
+		"""Remet dans le réseau les poids et l'inertie chargés, ainsi que l'état du générateur aléatoire. Lève une ValueError si le réseau ou le nombre d'exemples 'nb_exemples' ne correspondent pas au point de reprise"""
+
+		if len(self.entrainement) + len(self.validation) != nb_exemples:
+			raise ValueError("Point de reprise incompatible: {} exemples attendus, {} fournis".format(len(self.entrainement) + len(self.validation), nb_exemples))
+		if [len(couche) for couche in reseau] != [len(matrice) for matrice, delta_prec in self.couches]:
+			raise ValueError("Point de reprise incompatible avec l'architecture du réseau ({})".format(reseau.architecture()))
+		for couche, (matrice, delta_prec) in zip(reseau, self.couches): # Le réseau n'a pas besoin d'avoir été initialisé
+			couche._lier(matrice.copy(), delta_prec.copy())
+		for couche, (nom, moments, iterations) in zip(reseau, self.optimiseurs):
+			couche.utiliser_optimiseur(nom)
+			couche.moments = moments.reshape((couche.optimiseur.nb_moments, ) + couche.matrice.shape)
+			couche.iterations = iterations
+		random.setstate(self.hasard)
+
+
+# Entraînement réparti sur plusieurs processus
+
+class EntrainementParallele:
+
+	"""Entraînement par lots d'un réseau réparti sur plusieurs processus: les exemples, les résultats attendus et les poids de toutes les couches sont placés en mémoire partagée (multiprocessing.shared_memory). Chaque lot est découpé en parts, une par processus, qui calculent les corrections de leur part; elles sont ensuite additionnées et moyennées pour corriger le réseau une seule fois par lot.
+	Les couches du réseau utilisent directement la mémoire partagée tant que l'entraînement n'est pas fermé (voir EntrainementParallele.fermer): les processus voient donc chaque correction sans recopie"""
+
+	def __init__(self, reseau, exemples, resultats, processus = None):
+
+		"""Prépare l'entraînement de 'reseau' sur les exemples (matrice (N, d)) et résultats (matrice (N, k)) donnés, avec 'processus' processus (par défaut, un par coeur)"""
+
+		self.reseau = reseau
+		self.processus = processus or os.cpu_count()
+
+		exemples = np.asarray(exemples, dtype = float).reshape((len(exemples), -1))
+		resultats = np.asarray(resultats, dtype = float).reshape((len(resultats), -1))
+		formes = [couche.matrice.shape for couche in reseau]
+
+		self.memoires = {}
+		self.memoires["exemples"] = EntrainementParallele._partager(exemples.nbytes)
+		self.memoires["resultats"] = EntrainementParallele._partager(resultats.nbytes)
+		self.memoires["poids"] = EntrainementParallele._partager(sum(forme[0]*forme[1] for forme in formes)*8)
+
+		EntrainementParallele._vue(self.memoires["exemples"], exemples.shape)[...] = exemples
+		EntrainementParallele._vue(self.memoires["resultats"], resultats.shape)[...] = resultats
+		for couche, matrice in zip(reseau, EntrainementParallele._matrices(self.memoires["poids"], formes)):
+			matrice[...] = couche.matrice
+			couche._lier(matrice, couche.delta_prec) # Les poids du réseau sont désormais en mémoire partagée
+
+		noms = {cle: memoire.name for cle, memoire in self.memoires.items()}
+		activations = [couche.activation.nom for couche in reseau]
+		self.pool = multiprocessing.Pool(self.processus, initializer = _processus_init, initargs = (noms, exemples.shape, resultats.shape, formes, activations))
+
+	def _partager(taille):
+
+		"""Fonction interne: réserve un bloc de mémoire partagée d'au moins 'taille' octets"""
+
+		return shared_memory.SharedMemory(create = True, size = max(taille, 1)) # Un bloc vide n'est pas permis
+
+	def _vue(memoire, forme, decalage = 0):
+
+		"""Fonction interne: matrice de forme 'forme' lue dans la mémoire partagée 'memoire', à partir de 'decalage' octets"""
+
+		return np.ndarray(forme, dtype = float, buffer = memoire.buf, offset = decalage)
+
+	def _matrices(memoire, formes):
+
+		"""Fonction interne: découpe la mémoire partagée 'memoire' en matrices de formes 'formes' (les poids de chaque couche, les uns à la suite des autres)"""
+
+		matrices, decalage = [], 0
+		for forme in formes:
+			matrices.append(EntrainementParallele._vue(memoire, forme, decalage))
+			decalage += forme[0]*forme[1]*8
+		return matrices
+
+	def entrainer_lot(self, indices, taux_app = 0.5, inertie = 0.5):
+
+		"""Entraîne le réseau sur le lot des exemples d'indices 'indices', réparti entre les processus. Renvoie la somme des erreurs commises sur chaque exemple avant correction (voir Reseau.entrainer_lot)"""
+
+		parts = [part for part in np.array_split(np.asarray(indices, dtype = int), self.processus) if len(part)] # Seuls les indices sont envoyés aux processus
+		resultats = self.pool.map(_processus_gradients, parts) # Les poids ne sont pas modifiés pendant ce temps
+
+		err, deltas = resultats[0]
+		for err_part, deltas_part in resultats[1:]: # On additionne les corrections de chaque part
+			err += err_part
+			for delta, delta_part in zip(deltas, deltas_part):
+				delta += delta_part
+		self.reseau.corriger_lot(deltas, len(indices), taux_app = taux_app, inertie = inertie)
+		return err
+
+	def fermer(self):
+
+		"""Arrête les processus, et rend au réseau des poids qui ne dépendent plus de la mémoire partagée"""
+
+		self.pool.terminate()
+		self.pool.join()
+		for couche in self.reseau:
+			couche._lier(couche.matrice.copy(), couche.delta_prec)
+		for memoire in self.memoires.values():
+			memoire.close()
+			memoire.unlink()
+
+	def __enter__(self):
+
+		return self
+
+	def __exit__(self, *args):
+
+		self.fermer()
+
+# Fonctions exécutées dans chaque processus d'un EntrainementParallele (elles doivent être définies au niveau du module)
+
+_processus = {}
+
+def _processus_init(noms, forme_exemples, forme_resultats, formes, activations):
+
+	"""Ouvre la mémoire partagée d'un EntrainementParallele, et reconstitue un réseau dont les couches utilisent les poids partagés"""
+
+	memoires = {cle: shared_memory.SharedMemory(name = nom) for cle, nom in noms.items()}
+	reseau = Reseau()
+	for forme, matrice, nom in zip(formes, EntrainementParallele._matrices(memoires["poids"], formes), activations):
+		couche = Couche(forme[0])
+		couche.utiliser_activation(nom)
+		couche._lier(matrice, np.zeros(forme)) # Pas d'inertie ici: seul le processus principal corrige les poids
+		reseau.append(couche)
+	_processus["memoires"] = memoires # Gardées ouvertes tant que le processus existe
+	_processus["exemples"] = EntrainementParallele._vue(memoires["exemples"], forme_exemples)
+	_processus["resultats"] = EntrainementParallele._vue(memoires["resultats"], forme_resultats)
+	_processus["reseau"] = reseau
+
+def _processus_gradients(indices):
+
+	"""Calcule les corrections (sommées) pour les exemples d'indices 'indices', voir Reseau._gradients_lot"""
+
+	return _processus["reseau"]._gradients_lot(_processus["exemples"][indices], _processus["resultats"][indices])
+
+
+# Protocoles de lecture et écriture de réseaux OCR
+
+class ProtocoleJSON:
+
+	"""Protocole pour le format JSON"""
+
+	def __init__(self, chemin, mode):
+
+		modes = { "r": "r", "w": "w+" } # Modes "r" ou "w" uniquement
+		self.fichier = open(chemin, modes.get(mode, "r"))
+		try: # On essaye de charger un fichier
+			self.donnees = json.load(self.fichier)
+		except Exception as e: # Si ça ne marche pas, on initialise le futur fichier
+			self.donnees = { "echantillons": {} }
+
+	def __enter__(self): # Appelé par le mot-clé "with"
+
+		return self
+
+	def __exit__(self, *args): # Appelé en sortant d'un bloc "with"
+
+		self.fichier.close()
+
+	def sauver(self, reseau):
+
+		"""Sauve un réseau dans un fichier"""
+
+		donnees = reseau._export() # On génère les données de base
+		donnees["echantillons"] = {}
+
+		# On convertit les images en texte, elles sont encodées en base 64
+		for classe in reseau.classes:
+			donnees["echantillons"][classe] = images_base64 = []
+			for image in reseau.fichiers(classe):
+				image_base64 = base64.b64encode(image.getvalue())
+				images_base64.append(image_base64.decode("utf-8"))
+
+		json.dump(donnees, self.fichier)
+
+	def images(self):
+
+		"""Itérateur sur les images contenues dans le fichier"""
+
+		# Itérateur car le décodage peut être long
+
+		for classe, images_base64 in self.donnees["echantillons"].items():
+			for image_base64 in images_base64:
+				image = io.BytesIO(base64.b64decode(image_base64)) # On décode chacune des images dans un fichier mémoire (BytesIO)
+				image = ImageBinaire.open(image)
+				yield classe, image
+
+	def reseau(self):
+
+		"""Renvoie les données brutes du réseau (pas d'échantillons)"""
+
+		donnees = self.donnees.copy()
+		del donnees["echantillons"]
+		return donnees
+
+class ProtocoleZIP:
+
+	"""Protocole pour les fichiers ZIP"""
+
+	def __init__(self, chemin, mode):
+
+		modes = { "r": "r", "w": "w" }
+		self.fichier = zipfile.ZipFile(io.StringIO(chemin).getvalue(), modes.get(mode, "r"))
+
+	def __enter__(self):
+
+		return self
+
+	def __exit__(self, *args):
+
+		self.fichier.close()
+
+	def sauver(self, reseau):
+
+		"""Sauve un réseau dans un fichier"""
+
+		donnees = reseau._export()
+		self.fichier.writestr("reseau.json", json.dumps(donnees)) # Les données textes sont sauvées dans un fichier JSON, placé dans le ZIP
+
+		for classe in reseau.classes:
+			for index, image in enumerate(reseau.fichiers(classe)): # Les images sont sauvées a part
+				if classe == "/": classe = "__slash__" # On renomme l'éventuelle classe "/" qui va causer des bugs...
+				self.fichier.writestr(classe+"/"+str(index)+".png", image.getvalue())
+
+	def images(self):
+
+		"""Itérateur sur les images contenues dans le fichier"""
+
+		for nom in self.fichier.namelist(): # On itère sur les fichiers/dossiers, le ZIP contient des dossiers nommés selon les classes
+			if "/" in nom and not nom.endswith("/"): # Le nom comporte "/" dans son nom, donc il est dans un dossier, et c'est bien un fichier car son nom ne termine pas par un "/"
+				classe, vrai_nom = nom.split("/") # classe = nom du dossier, vrai_nom = nom du fichier
+				if classe == "__slash__": classe = "/"
+				image = self.fichier.read(nom)
+				image = io.BytesIO(image) # Encore une fois, on ouvre en mémoire
+				image = ImageBinaire.open(image) # Dernière étape: on créé une image binaire à partir du fichier mémoire!
+				yield classe, image
+
+	def reseau(self):
+
+		"""Renvoie les données brutes du réseau (pas d'échantillons)"""
+
+		donnees = self.fichier.open("reseau.json")
+		donnees = io.TextIOWrapper(donnees) # On ouvre en mémoire
 		donnees = json.load(donnees)
 		return donnees
 
 
+class CacheVecteurs:
+
+	"""Cache des vecteurs d'entrée (proportions) des échantillons, pour ne pas décoder les images et recalculer les vecteurs à chaque entraînement. Les vecteurs les moins récemment utilisés sont oubliés au-delà de 'taille_max' vecteurs"""
+
+	def __init__(self, taille_max = 100000):
+
+		self.taille_max = taille_max
+		self.vecteurs = collections.OrderedDict() # Garde l'ordre d'utilisation: les plus anciens en premier
+
+	def __len__(self):
+
+		return len(self.vecteurs)
+
+	def chemin(chemin_reseau):
+
+		"""Renvoie le chemin du fichier de cache associé à un fichier de réseau (ex: reseau.zip ==> reseau.vecteurs.json)"""
+
+		return os.path.splitext(chemin_reseau)[0] + ".vecteurs.json"
+
+	def cle(echantillon, grille):
+
+		"""Renvoie la clé d'un échantillon (image ou chemin vers une image) pour une grille donnée: une empreinte de son contenu, suivie de la grille"""
+
+		empreinte = hashlib.sha1()
+		if isinstance(echantillon, ImageBinaire):
+			tab = echantillon.tableau
+			empreinte.update(str(tab.shape).encode("utf-8"))
+			empreinte.update(np.packbits(tab).tobytes()) # 8 pixels par octet
+		else: # Un chemin: on lit le fichier sans décoder l'image
+			with open(echantillon, "rb") as fichier:
+				empreinte.update(fichier.read())
+		gx, gy = grille
+		return "{}/{}x{}".format(empreinte.hexdigest(), gx, gy)
+
+	def get(self, cle):
+
+		"""Renvoie le vecteur associé à une clé, ou None s'il n'est pas dans le cache"""
+
+		vecteur = self.vecteurs.get(cle)
+		if vecteur is not None:
+			self.vecteurs.move_to_end(cle) # Utilisé récemment
+		return vecteur
+
+	def ajouter(self, cle, vecteur):
+
+		"""Ajoute un vecteur au cache, en oubliant les plus anciens si nécessaire"""
+
+		self.vecteurs[cle] = vecteur
+		self.vecteurs.move_to_end(cle)
+		while len(self.vecteurs) > self.taille_max:
+			self.vecteurs.popitem(last = False)
+
+	def enlever(self, cle):
+
+		"""Enlève un vecteur du cache"""
+
+		self.vecteurs.pop(cle, None)
+
+	def vider(self):
+
+		"""Vide le cache"""
+
+		self.vecteurs.clear()
+
+	def sauver(self, chemin):
+
+		"""Sauve le cache dans un fichier JSON"""
+
+		with open(chemin, "w+") as fichier:
+			json.dump({ "taille_max": self.taille_max, "vecteurs": list(self.vecteurs.items()) }, fichier)
+
+	def charger(self, chemin):
+
+		"""Charge un cache sauvé avec CacheVecteurs.sauver (les vecteurs déjà présents sont conservés)"""
+
+		with open(chemin, "r") as fichier:
+			donnees = json.load(fichier)
+		for cle, vecteur in donnees["vecteurs"]:
+			self.ajouter(cle, vecteur)
+
+
+# Méthode des k plus proches voisins (alternative au réseau de neurones)
+
+class IndexVoisins:
+
+	"""Index des plus proches voisins d'un ensemble de points: un arbre k-d dont chaque noeud garde la boîte englobante de ses points. L'espace est découpé récursivement selon la médiane de la coordonnée la plus étendue, jusqu'à des feuilles d'au plus 'taille_feuille' points.
+	Une requête visite les noeuds par distance croissante à leur boîte, et s'arrête dès que la plus proche boîte restante est plus loin que le k-ième voisin trouvé. Sur des points répartis uniformément, l'arbre n'écarte presque rien: calculer les distances à tous les points (un produit matriciel par paquet de requêtes) est alors plus rapide. La méthode est choisie pour chaque lot, d'après les temps mesurés à la construction (voir IndexVoisins._mesurer)"""
+
+	paquet = 256 # Requêtes traitées à la fois sans l'arbre: limite la mémoire utilisée (paquet × nombre de points distances à la fois)
+	essais = 16 # Nombre de points de l'index utilisés comme requêtes pour mesurer le temps de chaque méthode
+
+	def __init__(self, points, taille_feuille = 1024):
+
+		points = np.asarray(points, dtype = float).reshape((len(points), -1)) if len(points) else np.zeros((0, 0))
+		ordre = np.arange(len(points))
+		noeuds, minimums, maximums = [], [], []
+		pile = [(0, len(points), -1, 0)] if len(points) else [] # (début, fin, parent, côté)
+		while len(pile):
+			debut, fin, parent, cote = pile.pop()
+			if parent >= 0:
+				noeuds[parent][2 + cote] = len(noeuds)
+			sous = points[ordre[debut:fin]]
+			minimums.append(sous.min(axis = 0))
+			maximums.append(sous.max(axis = 0))
+			noeuds.append([debut, fin, -1, -1])
+			etendues = maximums[-1] - minimums[-1]
+			if fin - debut <= taille_feuille or etendues.max() == 0: # Feuille (ou points tous identiques)
+				continue
+			milieu = (fin - debut)//2
+			partition = np.argpartition(sous[:, np.argmax(etendues)], milieu) # Médiane, sans trier
+			ordre[debut:fin] = ordre[debut:fin][partition]
+			pile.append((debut + milieu, fin, len(noeuds)-1, 1))
+			pile.append((debut, debut + milieu, len(noeuds)-1, 0))
+
+		self.noeuds = tuple(tuple(noeud) for noeud in noeuds) # (début, fin, fils gauche, fils droit) de chaque noeud, fils à -1 pour une feuille; la racine est le noeud 0
+		self.ordre = ordre # Indice d'origine de chaque point
+		self.points = points[ordre] # Points rangés noeud par noeud: ceux d'un noeud sont points[début:fin]
+		self.normes = np.sum(self.points**2, axis = 1)
+		self.minimums = np.array(minimums).reshape((len(noeuds), points.shape[1])) # Boîtes englobantes
+		self.maximums = np.array(maximums).reshape((len(noeuds), points.shape[1]))
+		self.couts = self._mesurer()
+
+	def __len__(self):
+
+		return len(self.points)
+
+	def copier(self):
+
+		"""Renvoie une copie de l'index (sans le reconstruire), qui ne partage aucun tableau avec lui"""
+
+		copie = IndexVoisins.__new__(IndexVoisins)
+		copie.__dict__.update({nom: valeur.copy() if isinstance(valeur, np.ndarray) else valeur for nom, valeur in self.__dict__.items()})
+		return copie
+
+	def tableaux(self):
+
+		"""Renvoie les tableaux de l'index (voir ReseauFige._figer)"""
+
+		return (self.ordre, self.points, self.normes, self.minimums, self.maximums)
+
+	def _mesurer(self):
+
+		"""Fonction interne: mesure, sur quelques points de l'index pris comme requêtes, le temps d'une requête par l'arbre, et celui du calcul de toutes les distances pour une requête et pour un lot. Renvoie (arbre, fixe, par_requete) en secondes: un lot de n requêtes prend environ n*arbre par l'arbre, fixe + n*par_requete sans"""
+
+		if len(self.noeuds) <= 1: # Une seule feuille: l'arbre n'écarte rien
+			return (np.inf, 0.0, 0.0)
+		essais = self.points[np.linspace(0, len(self)-1, IndexVoisins.essais).astype(int)]
+		un = []
+		for i in range(2): # La première fois, le calcul peut être ralenti (initialisation de la bibliothèque d'algèbre linéaire...)
+			debut = time.perf_counter()
+			self._voisins_tous(essais[:1], 5)
+			un.append(time.perf_counter() - debut)
+		debut = time.perf_counter()
+		self._voisins_tous(essais, 5)
+		lot = time.perf_counter() - debut
+		par_requete = max((lot - un[-1])/(len(essais)-1), 0.0)
+		fixe = max(un[-1] - par_requete, 0.0)
+
+		debut = time.perf_counter()
+		for requete in essais:
+			self._chercher(requete, 5)
+			if time.perf_counter() - debut > len(essais)*un[-1]: # Déjà plus lent que ces requêtes une par une sans l'arbre: l'arbre ne sera jamais utilisé
+				return (np.inf, fixe, par_requete)
+		return ((time.perf_counter() - debut)/len(essais), fixe, par_requete)
+
+	def _chercher(self, requete, k):
+
+		"""Fonction interne: carrés des distances et positions (dans self.points) des k plus proches points d'une requête, par l'arbre"""
+
+		meilleurs, positions = np.full(k, np.inf), np.full(k, -1)
+		rayon = np.inf # Carré de la distance du k-ième voisin trouvé
+		norme = requete @ requete
+		a_voir = [(0.0, 0)] # (carré de la distance à la boîte, noeud), la plus proche d'abord
+		while len(a_voir):
+			borne, noeud = heapq.heappop(a_voir)
+			if borne >= rayon: # Toutes les boîtes restantes sont plus loin
+				break
+			debut, fin, gauche, droite = self.noeuds[noeud]
+			if gauche < 0: # Feuille: distances à tous ses points
+				carres = norme + self.normes[debut:fin] - 2*(self.points[debut:fin] @ requete)
+				tous = np.concatenate([meilleurs, carres])
+				garder = np.argpartition(tous, k-1)[:k]
+				meilleurs, positions = tous[garder], np.concatenate([positions, np.arange(debut, fin)])[garder]
+				rayon = meilleurs.max()
+				continue
+			ecarts = np.maximum(self.minimums[[gauche, droite]] - requete, 0) + np.maximum(requete - self.maximums[[gauche, droite]], 0)
+			for fils, borne in zip((gauche, droite), np.einsum("ij,ij->i", ecarts, ecarts).tolist()):
+				if borne < rayon:
+					heapq.heappush(a_voir, (borne, fils))
+		return meilleurs, positions
+
+	def _voisins_tous(self, requetes, k):
+
+		"""Fonction interne: comme IndexVoisins._chercher pour un lot de requêtes, en calculant les distances à tous les points"""
+
+		carres_k = np.empty((len(requetes), k))
+		positions = np.empty((len(requetes), k), dtype = int)
+		p = IndexVoisins.paquet
+		for i in range(0, len(requetes), p):
+			carres = np.sum(requetes[i:i+p]**2, axis = 1)[:, np.newaxis] + self.normes[np.newaxis] - 2*requetes[i:i+p] @ self.points.T
+			garder = np.argpartition(carres, k-1, axis = 1)[:, :k] # Les k meilleurs, sans trier
+			carres_k[i:i+p] = np.take_along_axis(carres, garder, axis = 1)
+			positions[i:i+p] = garder
+		return carres_k, positions
+
+	def voisins(self, requetes, k = 1):
+
+		"""Renvoie les distances (matrice (N, k)) et les indices (matrice (N, k)) des k plus proches points de chaque requête d'un lot (matrice (N, d)), du plus proche au plus lointain. Le lot est traité par l'arbre ou non selon le plus rapide (voir IndexVoisins._mesurer)"""
+
+		requetes = np.asarray(requetes, dtype = float).reshape((len(requetes), -1))
+		k = min(k, len(self))
+		n = len(requetes)
+		if k == 0 or n == 0:
+			return np.full((n, k), np.inf), np.full((n, k), -1)
+		arbre, fixe, par_requete = self.couts
+		if n*arbre < fixe + n*par_requete:
+			carres, positions = np.empty((n, k)), np.empty((n, k), dtype = int)
+			for i, requete in enumerate(requetes):
+				carres[i], positions[i] = self._chercher(requete, k)
+		else:
+			carres, positions = self._voisins_tous(requetes, k)
+		tri = np.argsort(carres, axis = 1, kind = "stable")
+		return np.sqrt(np.maximum(np.take_along_axis(carres, tri, axis = 1), 0)), self.ordre[np.take_along_axis(positions, tri, axis = 1)]
+
+
+class ClassifieurKNN:
+
+	"""Classifieur des k plus proches voisins: la classe d'un exemple est la plus représentée parmi les k échantillons les plus proches (distance euclidienne). Les échantillons sont rangés une fois pour toutes dans un IndexVoisins.
+	Il a les mêmes méthodes de classement qu'un Reseau (classer, classer_lot), et peut donc le remplacer (voir ReseauOCR.utiliser_knn)"""
+
+	def __init__(self, k = 5):
+
+		self.k = k
+		self.classes = []
+		self.etiquettes = np.zeros(0, dtype = int) # Indice de la classe de chaque échantillon
+		self.index = IndexVoisins([])
+
+	def entrainer(self, exemples, classes):
+
+		"""Range les exemples (vecteurs) dans l'index, 'classes' donnant la classe (nom) de chacun. Pas d'apprentissage à proprement parler!"""
+
+		self.classes = list(dict.fromkeys(classes)) # Classes distinctes, dans l'ordre d'apparition
+		indices = {classe: i for i, classe in enumerate(self.classes)}
+		self.etiquettes = np.array([indices[classe] for classe in classes], dtype = int)
+		self.index = IndexVoisins(exemples)
+
+	def copier(self):
+
+		"""Renvoie une copie du classifieur, qui ne partage aucun tableau avec lui"""
+
+		copie = ClassifieurKNN(self.k)
+		copie.classes = list(self.classes)
+		copie.etiquettes = self.etiquettes.copy()
+		copie.index = self.index.copier()
+		return copie
+
+	def _votes_lot(self, exemples):
+
+		"""Fonction interne: proportion des k plus proches voisins appartenant à chaque classe (matrice (N, nombre de classes)), et rang du plus proche voisin de chaque classe (k si aucun)"""
+
+		distances, voisins = self.index.voisins(exemples, self.k)
+		etiquettes = self.etiquettes[voisins]
+		n, k = etiquettes.shape
+		lignes = np.arange(n)[:, np.newaxis]
+		votes = np.zeros((n, len(self.classes)))
+		np.add.at(votes, (lignes, etiquettes), 1)
+		premiers = np.full((n, len(self.classes)), k)
+		for j in range(k-1, -1, -1): # Les plus proches en dernier: ils l'emportent
+			premiers[np.arange(n), etiquettes[:, j]] = j
+		return votes/max(k, 1), premiers
+
+	def distances_lot(self, exemples):
+
+		"""Renvoie la matrice (N, nombre de classes) des "distances" entre chaque exemple et chaque classe: 1 - proportion des voisins appartenant à la classe (comme pour une sortie softmax, voir Reseau.distances_lot)"""
+
+		votes, premiers = self._votes_lot(exemples)
+		return 1 - votes
+
+	def classer_lot(self, exemples, filtre = 1):
+
+		"""Comme Reseau.classer_lot: renvoie une liste de classes probables par exemple, par nombre de voisins décroissant (à égalité, la classe du voisin le plus proche d'abord), en ne gardant que les classes de "distance" inférieure à 'filtre'"""
+
+		if len(self.index) == 0:
+			return [[] for exemple in exemples]
+		votes, premiers = self._votes_lot(exemples)
+		ordres = np.lexsort((premiers, -votes)) # Tri selon les votes, puis selon le rang du plus proche voisin
+		return [[self.classes[i] for i in ordre if 1 - ligne[i] < filtre] for ordre, ligne in zip(ordres.tolist(), votes.tolist())]
+
+	def classer(self, exemple, filtre = 1):
+
+		"""Voir Reseau.classer"""
+
+		return self.classer_lot([exemple], filtre)[0]
+
+
+# Lexique des mots attendus, pour contraindre la reconnaissance des chaînes
+
+class Lexique:
+
+	"""Un ensemble de mots rangé dans un arbre des préfixes compact: chaque noeud est un numéro, et les fils de tous les noeuds sont rangés (par caractère croissant) dans un même tableau.
+	Chercher un mot ou un préfixe prend un temps proportionnel à sa longueur, et un lexique construit une fois se sauve et se recharge presque instantanément (voir Lexique.sauver et Lexique.charger)"""
+
+	cache = 4096 # Nombre de noeuds dont les fils sont gardés en dictionnaires (les plus récemment parcourus)
+
+	def __init__(self, mots = ()):
+
+		# Arbre des préfixes sous forme de dictionnaires imbriqués ("" marque la fin d'un mot), puis mis à plat en largeur d'abord
+		racine = {}
+		for mot in mots:
+			noeud = racine
+			for c in mot:
+				noeud = noeud.setdefault(c, {})
+			noeud[""] = True
+
+		debuts, lettres, finals = [0], [], []
+		file = collections.deque([racine])
+		while len(file):
+			noeud = file.popleft()
+			finals.append("" in noeud)
+			for c in sorted(c for c in noeud if c != ""):
+				lettres.append(ord(c))
+				file.append(noeud[c])
+			debuts.append(len(lettres))
+
+		self._tableaux(np.array(debuts, dtype = np.uint32), np.array(lettres, dtype = np.uint32), np.array(finals, dtype = bool))
+
+	def _tableaux(self, debuts, lettres, finals):
+
+		"""Fonction interne: utilise les tableaux décrivant l'arbre. Les fils du noeud n sont lettres[debuts[n]:debuts[n+1]]; le fil numéro i de ce tableau (en partant de 0) mène au noeud i+1, la racine étant le noeud 0 (numérotation en largeur d'abord). finals[n] indique si le noeud n termine un mot"""
+
+		self.debuts, self.lettres, self.finals = debuts, lettres, finals
+		self._enfants = functools.lru_cache(maxsize = Lexique.cache)(self._lire_enfants) # Fils des noeuds parcourus récemment, sans garder tout l'arbre en dictionnaires
+
+	def __len__(self):
+
+		return int(np.count_nonzero(self.finals))
+
+	def __contains__(self, mot):
+
+		noeud = self.suivant(0, mot)
+		return noeud >= 0 and bool(self.finals[noeud])
+
+	def enfants(self, noeud):
+
+		"""Renvoie les fils d'un noeud, sous forme de dictionnaire {caractère: noeud}"""
+
+		return self._enfants(noeud)
+
+	def _lire_enfants(self, noeud):
+
+		"""Fonction interne: lit les fils d'un noeud dans les tableaux"""
+
+		debut, fin = int(self.debuts[noeud]), int(self.debuts[noeud+1])
+		return dict(zip(map(chr, self.lettres[debut:fin].tolist()), range(debut+1, fin+1)))
+
+	def suivant(self, noeud, texte):
+
+		"""Renvoie le noeud atteint depuis 'noeud' en lisant 'texte' (depuis la racine 0, le noeud du préfixe 'texte'), ou -1 si aucun mot ne continue ainsi"""
+
+		for c in texte:
+			noeud = self.enfants(noeud).get(c, -1)
+			if noeud < 0:
+				return -1
+		return noeud
+
+	def est_mot(self, noeud):
+
+		"""Indique si le noeud termine un mot"""
+
+		return noeud >= 0 and bool(self.finals[noeud])
+
+	def sauver(self, chemin):
+
+		"""Sauve le lexique (tableaux NumPy, sans compression) dans le fichier 'chemin'"""
+
+		with open(chemin, "wb") as fichier:
+			np.savez(fichier, debuts = self.debuts, lettres = self.lettres, finals = self.finals)
+
+	def charger(chemin):
+
+		"""Ouvre un lexique sauvé avec Lexique.sauver, ou construit le lexique d'un fichier texte (un mot par ligne)"""
+
+		if zipfile.is_zipfile(chemin): # Format de np.savez
+			with np.load(chemin) as tableaux:
+				lexique = Lexique()
+				lexique._tableaux(tableaux["debuts"], tableaux["lettres"], tableaux["finals"])
+			return lexique
+		with open(chemin, "r", encoding = "utf-8") as fichier:
+			return Lexique(ligne.strip() for ligne in fichier if ligne.strip())
+
+
 class ReseauOCR(Reseau): # On se base sur Reseau
 
 	"""Un réseau spécialisé dans l'OCR"""
@@ -816,6 +2123,9 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 		Reseau.__init__(self, *args, **kwargs)
 		self.grille = (3, 5) # La grille est juste une autre facon d'exprimer l'entrée du reseau
 		self.echantillons = {} # Principale différence avec le réseau basique: stockage d'échantillons images
+		self.cache = CacheVecteurs() # Vecteurs d'entrée des échantillons déjà calculés
+		self.knn = None # Nombre de voisins si la reconnaissance utilise les k plus proches voisins plutôt que le réseau (voir ReseauOCR.utiliser_knn)
+		self._classifieur_knn = None
 
 	def _export(self):
 
@@ -823,6 +2133,7 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 
 		donnees = Reseau._export(self)
 		donnees["grille"] = self.grille # On ajoute d'autres informations aux données, la gestion des images est à la charge des protocoles
+		donnees["knn"] = self.knn
 		return donnees
 
 	def _import(self, donnees):
@@ -830,7 +2141,8 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 		"""Voir Reseau._import"""
 
 		Reseau._import(self, donnees) # Voir Reseau._import pour les explications concernant les choix d'implémentation
-		self.grille = donnees.get("grille", (3, 5))
+		self.grille = tuple(donnees.get("grille", (3, 5)))
+		self.utiliser_knn(donnees.get("knn", None))
 
 	def copier(self):
 
@@ -839,30 +2151,37 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 		donnees = self._export()
 		copie = ReseauOCR()
 		copie._import(donnees)
+		copie.cache = self.cache # Les clés dépendent du contenu des échantillons: le cache peut être partagé sans risque
 		for classe in self.classes:
 			for image in self.images(classe):
 				copie.ajout_echantillon(classe, image)
 		return copie
 
-	def ouvrir(self, chemin, protocole = None):
+	def ouvrir(self, chemin, protocole = None, echantillons = True):
 
-		"""Ouvre un fichier dans le réseau, avec le protocole spécifié"""
+		"""Ouvre un fichier dans le réseau, avec le protocole spécifié. Si un cache de vecteurs a été sauvé à côté du fichier, il est également chargé.
+		Avec echantillons = False, seuls les poids sont chargés (pas d'images à décoder): suffisant pour la reconnaissance avec le réseau"""
 
 		if protocole is None:
 			protocole = ReseauOCR.get_protocole(chemin)
 		with protocole(chemin, "r") as fichier:
-			for classe, image in fichier.images():
-				self.ajout_echantillon(classe, image)
+			if echantillons:
+				for classe, image in fichier.images():
+					self.ajout_echantillon(classe, image)
 			self._import(fichier.reseau())
+		if echantillons and os.path.exists(CacheVecteurs.chemin(chemin)):
+			self.cache.charger(CacheVecteurs.chemin(chemin))
 
-	def sauver(self, chemin, protocole = None):
+	def sauver(self, chemin, protocole = None, cache = False):
 
-		"""Sauve le réseau dans un fichier, avec le protocole spécifié"""
+		"""Sauve le réseau dans un fichier, avec le protocole spécifié. Avec 'cache', le cache des vecteurs d'entrée est sauvé à côté (voir CacheVecteurs.chemin)"""
 
 		if protocole is None:
 			protocole = ReseauOCR.get_protocole(chemin)
 		with protocole(chemin, "w") as fichier:
 			fichier.sauver(self)
+		if cache:
+			self.cache.sauver(CacheVecteurs.chemin(chemin))
 
 	def initialiser(self, grille):
 
@@ -870,8 +2189,36 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 
 		gx, gy = grille
 		self.grille = tuple(grille)
+		self._classifieur_knn = None # Les vecteurs des échantillons dépendent de la grille
 		Reseau.initialiser(self, gx*gy)
 
+	def utiliser_knn(self, k = 5):
+
+		"""Utilise, pour la reconnaissance, un classifieur des k plus proches voisins (voir ClassifieurKNN) parmi les échantillons à la place du réseau; avec k = None, on revient au réseau.
+		L'index des échantillons est construit à la première reconnaissance, et reconstruit seulement si les échantillons ou la grille changent"""
+
+		self.knn = k
+		self._classifieur_knn = None
+
+	def classifieur(self):
+
+		"""Renvoie ce qui classe les vecteurs lors de la reconnaissance: le réseau lui-même, ou le classifieur des k plus proches voisins (voir ReseauOCR.utiliser_knn)"""
+
+		if self.knn is None:
+			return self
+		if self._classifieur_knn is None:
+			exemples, resultats = self.charger_echantillons()
+			classes = [classe for classe in self.classes for echantillon in self.echantillons[classe]] # Même ordre que les exemples
+			self._classifieur_knn = ClassifieurKNN(self.knn)
+			self._classifieur_knn.entrainer(exemples, classes)
+		return self._classifieur_knn
+
+	def figer(self):
+
+		"""Renvoie une copie figée du réseau, pour la reconnaissance seulement (voir ReseauFige)"""
+
+		return ReseauFige(self)
+
 	def ajout_classe(self, nom):
 
 		"""Voir Reseau.ajout_classe"""
@@ -879,6 +2226,14 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 		Reseau.ajout_classe(self, nom)
 		if not nom in self.echantillons:
 			self.echantillons[nom] = []
+		self._classifieur_knn = None
+
+	def enlever_classe(self, nom):
+
+		"""Voir Reseau.enlever_classe"""
+
+		Reseau.enlever_classe(self, nom)
+		self._classifieur_knn = None
 
 	def ajout_echantillon(self, classe, image):
 
@@ -887,12 +2242,16 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 		if not classe in self.echantillons:
 			self.echantillons[classe] = []
 		self.echantillons[classe].append(image)
+		self._classifieur_knn = None # L'index des k plus proches voisins devra être reconstruit
 
 	def enlever_echantillon(self, classe, index):
 
 		"""Enlève un échantillon désigné pas son indice"""
 
-		self.echantillons[classe].pop(index)
+		echantillon = self.echantillons[classe].pop(index)
+		self._classifieur_knn = None
+		try: self.cache.enlever(CacheVecteurs.cle(echantillon, self.grille)) # Le vecteur associé n'est plus utile
+		except Exception: pass # Chemin qui n'existe plus: rien dans le cache
 
 	def image(self, classe, i):
 
@@ -925,46 +2284,375 @@ class ReseauOCR(Reseau): # On se base sur Reseau
 
 		exemples = []
 		resultats = []
-		for classe in self.classes:
-			for image in self.images(classe):
-				image.recentrer()
-				exemples.append(image.proportions(self.grille))
-				resultats.append(self.representation(classe))
+		for classe, code in zip(self.classes, self.codes().tolist()): # Représentation de chaque classe, calculée une seule fois
+			for echantillon in self.echantillons[classe]:
+				exemples.append(self.vecteur_echantillon(echantillon))
+				resultats.append(list(code))
 		return exemples, resultats
 
+	def vecteur_echantillon(self, echantillon):
+
+		"""Renvoie le vecteur d'entrée d'un échantillon (image ou chemin vers une image) pour la grille du réseau, en passant par le cache"""
+
+		cle = CacheVecteurs.cle(echantillon, self.grille)
+		vecteur = self.cache.get(cle)
+		if vecteur is None:
+			image = echantillon if isinstance(echantillon, ImageBinaire) else ImageBinaire.open(echantillon)
+			vecteur = image.vecteur(self.grille) # L'échantillon n'est pas modifié
+			self.cache.ajouter(cle, vecteur)
+		return list(vecteur)
+
 	def reconnaitre_caractere(self, image, filtre = 0.5):
 
 		"""Similaire à Reseau.classer, mais avec une image ou un chemin vers une image"""
 
-		try: image = ImageBinaire.open(image) # Cas ou l'échantillon est un chemin d'accès, on tente d'ouvrir
-		except: pass # Ca n'a pas marché, le fichier est déjà une image
-		image.recentrer()
-		exemple = image.proportions(self.grille)
-		return self.classer(exemple, filtre)
+		return self.reconnaitre_caracteres([image], filtre)[0]
+
+	def vecteurs_images(self, images):
+
+		"""Renvoie les vecteurs d'entrée (pour la grille du réseau) d'une liste d'images ou de chemins vers des images"""
+
+		vecteurs = []
+		for image in images:
+			try: image = ImageBinaire.open(image) # Cas ou l'échantillon est un chemin d'accès, on tente d'ouvrir
+			except: pass # Ca n'a pas marché, le fichier est déjà une image
+			vecteurs.append(image.vecteur(self.grille))
+		return vecteurs
+
+	def reconnaitre_caracteres(self, images, filtre = 0.5):
+
+		"""Comme ReseauOCR.reconnaitre_caractere, pour une liste d'images (ou de chemins vers des images) évaluées en un seul lot par le réseau (ou le classifieur des k plus proches voisins, voir ReseauOCR.utiliser_knn)"""
+
+		vecteurs = self.vecteurs_images(images)
+		if not len(vecteurs):
+			return []
+		return self.classifieur().classer_lot(vecteurs, filtre) # Le réseau, ou les k plus proches voisins
+
+	def recherche_faisceau(distances, classes, filtre = 0.5, largeur = 10, lexique = None):
+
+		"""Renvoie les 'largeur' chaînes de plus petite distance cumulée, sous forme de liste de couples (chaîne, distance), de la plus probable à la moins probable.
+		'distances' est la matrice (nombre de caractères, nombre de classes) des distances entre chaque caractère et chaque classe (voir Reseau.distances_lot): seules les classes à une distance inférieure à 'filtre' sont candidates, et un caractère sans candidat devient "?" (pour une distance 'filtre').
+		Avec un lexique (voir Lexique), seules les chaînes préfixes d'un mot du lexique sont gardées, et seuls les mots complets sont renvoyés; si aucun mot ne correspond, on renvoie les chaînes obtenues sans lexique.
+		Lève ValueError si 'largeur' est inférieure à 1 ou si 'filtre' n'est pas un nombre fini"""
 
-	def reconnaitre_chaine(self, image, decoupage = ImageBinaire.decouper, filtre = 0.5):
+		if not largeur >= 1:
+			raise ValueError("largeur du faisceau invalide: {} (au moins 1)".format(largeur))
+		if not math.isfinite(filtre):
+			raise ValueError("filtre invalide: {} (un nombre fini)".format(filtre))
 
-		"""Renvoie une liste de chaînes probables pour l'image fournie, de la plus probable à la moins probable. L'argument 'decoupage' permet de specifier un algorithme de découpage de caractères particulier (voir ImageBinaire)"""
+		chaines, scores = ["", ], np.zeros(1)
+		noeuds = [0] # Noeud du lexique atteint par chaque chaîne
+
+		for ligne in np.asarray(distances, dtype = float).reshape((len(distances), len(classes))):
+
+			candidats = np.argsort(ligne, kind = "stable")
+			candidats = candidats[ligne[candidats] < filtre]
+			if len(candidats):
+				caracteres, couts = [classes[i] for i in candidats.tolist()], ligne[candidats]
+			else:
+				caracteres, couts = ["?", ], np.array([filtre])
+
+			# Toutes les extensions des chaînes du faisceau, dont on ne garde que les 'largeur' meilleures
+			totaux = (scores[:, np.newaxis] + couts[np.newaxis, :]).ravel()
+			if lexique is not None:
+				suivants = [lexique.suivant(noeud, c) for noeud in noeuds for c in caracteres] # Même ordre que 'totaux'
+				totaux[np.array(suivants) < 0] = np.inf # Extensions qui ne mènent à aucun mot: écartées
+			if len(totaux) > largeur:
+				garder = np.argpartition(totaux, largeur-1)[:largeur]
+				garder = garder[np.lexsort((garder, totaux[garder]))] # Tri selon le score, puis dans l'ordre des extensions (comme un tri stable)
+			else:
+				garder = np.argsort(totaux, kind = "stable")
+			garder = garder[np.isfinite(totaux[garder])]
+			if not len(garder): # Plus aucun préfixe de mot
+				return [] if lexique is None else ReseauOCR.recherche_faisceau(distances, classes, filtre, largeur)
+			chaines = [chaines[i//len(caracteres)] + caracteres[i%len(caracteres)] for i in garder.tolist()]
+			scores = totaux[garder]
+			if lexique is not None:
+				noeuds = [suivants[i] for i in garder.tolist()]
+
+		resultats = list(zip(chaines, scores.tolist()))
+		if lexique is not None:
+			resultats = [resultat for resultat, noeud in zip(resultats, noeuds) if lexique.est_mot(noeud)]
+			if not len(resultats): # Des préfixes, mais aucun mot complet
+				return ReseauOCR.recherche_faisceau(distances, classes, filtre, largeur)
+		return resultats
+
+	def reconnaitre_chaine(self, image, decoupage = ImageBinaire.decouper, filtre = 0.5, largeur = 10, scores = False, lexique = None):
+
+		"""Renvoie une liste de chaînes probables pour l'image fournie, de la plus probable à la moins probable. L'argument 'decoupage' permet de specifier un algorithme de découpage de caractères particulier (voir ImageBinaire).
+		Au plus 'largeur' chaînes sont gardées (voir ReseauOCR.recherche_faisceau); avec scores = True, renvoie des couples (chaîne, distance cumulée). Un lexique (voir Lexique), chargé une fois pour tous les appels, restreint les chaînes à ses mots"""
 
 		try: image = ImageBinaire.open(image) # Cas ou l'échantillon est un chemin d'accès, on tente d'ouvrir
 		except: pass # Ca n'a pas marché, le fichier est déjà une image
 
-		liste = [image]
-		if decoupage is not False:
-			liste = [ImageBinaire.depuis_liste(carac) for carac in decoupage(image)]
+		vecteurs = self.vecteurs_images(image.caracteres(decoupage))
+		classifieur = self.classifieur() # Le réseau, ou les k plus proches voisins
+		distances = classifieur.distances_lot(vecteurs) if len(vecteurs) else np.zeros((0, len(classifieur.classes))) # Tous les caractères de l'image sont évalués en un seul lot
+
+		resultats = ReseauOCR.recherche_faisceau(distances, classifieur.classes, filtre, largeur, lexique)
+		return resultats if scores else [chaine for chaine, score in resultats]
+
+	etapes_flux = ["lecture", "binarisation", "nettoyage", "decoupage", "vecteurs", "classement", "attente"] # Voir ReseauOCR.reconnaitre_flux
+
+	def reconnaitre_flux(self, sources, decoupage = ImageBinaire.decouper, filtre = 0.5, largeur = 10, scores = False, lexique = None, seuil = 128, parasites = None, ordre = True, fils = 4, taille_file = 16, temps = None):
+
+		"""Reconnaît une suite d'images, lue au fur et à mesure (un générateur de chemins peut être arbitrairement long), chacune donnée par son chemin, un fichier ouvert ou son contenu (bytes). Générateur de triplets (indice de l'image dans 'sources', chaînes probables comme ReseauOCR.reconnaitre_chaine, erreur ou None).
+		Les étapes forment une chaîne de production reliée par des files bornées: lecture et binarisation (avec 'seuil') dans 'fils' fils d'exécution, pour que les accès disque recouvrent le calcul; nettoyage (ImageBinaire.enlever_parasites, si 'parasites' n'est pas None), découpage et vecteurs dans un autre fil; classement (par lots) dans l'appelant.
+		Au plus 'taille_file' images sont en cours à la fois: la mémoire utilisée ne dépend pas du nombre d'images. Les résultats sont rendus dans l'ordre des images, ou dès qu'ils sont prêts avec ordre = False. Le dictionnaire 'temps', s'il est fourni, reçoit la durée cumulée (en secondes) de chaque étape (voir ReseauOCR.etapes_flux; "attente": temps passé par l'appelant à attendre les images)"""
+
+		temps = {} if temps is None else temps
+		for etape in ReseauOCR.etapes_flux:
+			temps[etape] = 0.0
+		verrou = threading.Lock() # Pour 'temps', mis à jour par plusieurs fils
+		arret = threading.Event() # L'appelant a abandonné le générateur: tous les fils s'arrêtent
+		places = threading.Semaphore(taille_file) # Une place par image en cours, rendue quand son résultat est donné
+		decodees, pretes = queue.Queue(taille_file), queue.Queue(taille_file)
+		fin = object() # Marque la fin des images dans une file
+		classifieur = self.classifieur() # Le réseau, ou les k plus proches voisins (index construit avant de démarrer)
+		lecteurs = ThreadPoolExecutor(fils)
+
+		def chronometrer(etape, debut):
+			maintenant = time.perf_counter()
+			with verrou:
+				temps[etape] += maintenant - debut
+			return maintenant
+
+		def deposer(file, element): # File.put, abandonné en cas d'arrêt
+			while not arret.is_set():
+				try:
+					file.put(element, timeout = 0.1)
+					return
+				except queue.Full:
+					pass
+
+		def prendre(file): # File.get, 'fin' en cas d'arrêt
+			while not arret.is_set():
+				try:
+					return file.get(timeout = 0.1)
+				except queue.Empty:
+					pass
+			return fin
+
+		def lire(indice, source): # Lecture, décodage et binarisation d'une image (dans un des fils 'lecteurs')
+			try:
+				debut = time.perf_counter()
+				img = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+				img.load() # PIL ne lit l'image qu'au premier accès aux pixels
+				debut = chronometrer("lecture", debut)
+				image = ImageBinaire(img) if img.mode == "1" else ImageBinaire.depuis_image(img, seuil) # Comme ImageBinaire.open
+				chronometrer("binarisation", debut)
+				deposer(decodees, (indice, image, None))
+			except Exception as e:
+				deposer(decodees, (indice, None, e))
+
+		def alimenter(): # Distribue les images aux lecteurs, tant qu'il reste des places
+			try:
+				for indice, source in enumerate(sources):
+					while not places.acquire(timeout = 0.1):
+						if arret.is_set():
+							return
+					if arret.is_set():
+						return
+					lecteurs.submit(lire, indice, source)
+			except Exception as e: # Erreur de 'sources' elle-même: transmise à l'appelant
+				deposer(decodees, (None, None, e))
+			lecteurs.shutdown(wait = True) # Toutes les images lues avant de marquer la fin
+			deposer(decodees, fin)
+
+		def preparer(): # Nettoyage, découpage et vecteurs
+			while True:
+				element = prendre(decodees)
+				if element is fin:
+					deposer(pretes, fin)
+					return
+				indice, image, erreur = element
+				vecteurs = None
+				if erreur is None:
+					try:
+						debut = time.perf_counter()
+						if parasites is not None:
+							image.enlever_parasites(parasites)
+						debut = chronometrer("nettoyage", debut)
+						caracteres = image.caracteres(decoupage)
+						debut = chronometrer("decoupage", debut)
+						vecteurs = self.vecteurs_images(caracteres)
+						chronometrer("vecteurs", debut)
+					except Exception as e:
+						erreur = e
+				deposer(pretes, (indice, vecteurs, erreur))
+
+		threading.Thread(target = alimenter, daemon = True).start()
+		threading.Thread(target = preparer, daemon = True).start()
+
+		en_avance = {} # Résultats arrivés avant ceux des images précédentes (avec ordre = True)
+		suivant = 0
+		try:
+			termine = False
+			while not termine:
+
+				# Toutes les images prêtes sont classées en un seul lot
+				debut = time.perf_counter()
+				lot = [pretes.get()]
+				while len(lot) < taille_file and lot[-1] is not fin:
+					try: lot.append(pretes.get_nowait())
+					except queue.Empty: break
+				debut = chronometrer("attente", debut)
+				if lot[-1] is fin:
+					termine = True
+					lot.pop()
+
+				tous = [vecteur for indice, vecteurs, erreur in lot if erreur is None for vecteur in vecteurs]
+				distances = classifieur.distances_lot(tous) if len(tous) else np.zeros((0, len(classifieur.classes)))
+				resultats, position = [], 0
+				for indice, vecteurs, erreur in lot:
+					if indice is None:
+						raise erreur
+					chaines = []
+					if erreur is None:
+						chaines = ReseauOCR.recherche_faisceau(distances[position:position+len(vecteurs)], classifieur.classes, filtre, largeur, lexique)
+						chaines = chaines if scores else [chaine for chaine, score in chaines]
+						position += len(vecteurs)
+					resultats.append((indice, chaines, erreur))
+				chronometrer("classement", debut)
+
+				for resultat in resultats:
+					if not ordre:
+						places.release()
+						yield resultat
+						continue
+					en_avance[resultat[0]] = resultat
+					while suivant in en_avance:
+						places.release()
+						yield en_avance.pop(suivant)
+						suivant += 1
+		finally:
+			arret.set()
+			lecteurs.shutdown(wait = False, cancel_futures = True)
+
+
+# Réseau figé: une copie en lecture seule, pour la reconnaissance
+
+class ReseauFige:
+
+	"""Une copie figée d'un ReseauOCR (voir ReseauOCR.figer): matrices des poids en lecture seule, classes, grille et codage, et l'index des k plus proches voisins si le réseau l'utilise; ni échantillons, ni état d'entraînement (inertie, moments de l'optimiseur).
+	Rien ne peut y être modifié: elle peut être partagée entre plusieurs fils d'exécution pendant que le réseau d'origine est modifié ou entraîné, et envoyée à d'autres processus (pickle) à peu de frais"""
+
+	def __init__(self, reseau):
+
+		classifieur = reseau.classifieur()
+		self.__dict__.update({ # Et non self.x = ..., interdit (voir ReseauFige.__setattr__)
+			"matrices": tuple(couche.matrice.copy() for couche in reseau),
+			"activations": tuple(couche.activation.nom for couche in reseau), # Les fonctions sont retrouvées par leur nom (voir Couche.activations)
+			"classes": tuple(reseau.classes),
+			"codage": reseau.codage,
+			"grille": tuple(reseau.grille),
+			"softmax": reseau.softmax,
+			"knn": reseau.knn,
+			"_codes": reseau.codes().copy(),
+			"_classifieur_knn": None if classifieur is reseau else classifieur.copier(), # Une copie, figée elle aussi
+		})
+		self._figer()
+
+	def _figer(self):
+
+		"""Fonction interne: passe les tableaux en lecture seule (ceux des k plus proches voisins compris)"""
+
+		tableaux = self.matrices + (self._codes, )
+		knn = self._classifieur_knn
+		if knn is not None:
+			knn.classes = tuple(knn.classes)
+			tableaux += (knn.etiquettes, ) + knn.index.tableaux()
+		for tableau in tableaux:
+			tableau.flags.writeable = False
+
+	def __setattr__(self, nom, valeur):
+
+		raise AttributeError("ReseauFige ne peut pas être modifié")
+
+	def __delattr__(self, nom):
+
+		raise AttributeError("ReseauFige ne peut pas être modifié")
+
+	def __setstate__(self, etat): # Après pickle.load, les tableaux sont de nouveau modifiables
+
+		self.__dict__.update(etat)
+		self._figer()
+
+	def __repr__(self):
+
+		return "ReseauFige({})".format(", ".join(str(len(matrice)) for matrice in self.matrices))
+
+	def sortie_lot(self, exemples):
+
+		"""Voir Reseau.sortie_lot"""
+
+		sortie = np.asarray(exemples, dtype = float).reshape((len(exemples), -1))
+		for matrice, nom in zip(self.matrices, self.activations):
+			sortie = Couche.activations[nom](sortie @ matrice[:, :-1].T - matrice[:, -1]) # Comme Couche.sortie_lot: l'entrée du biais vaut -1
+		return sortie
+
+	def codes(self):
+
+		"""Voir Reseau.codes"""
+
+		return self._codes
+
+	def distances_lot(self, exemples):
+
+		"""Voir Reseau.distances_lot"""
+
+		return Reseau.distances_lot(self, exemples)
+
+	def classer_lot(self, exemples, filtre = 1):
+
+		"""Voir Reseau.classer_lot"""
+
+		return Reseau.classer_lot(self, exemples, filtre)
+
+	def classer(self, exemple, filtre = 1):
+
+		"""Voir Reseau.classer"""
+
+		return self.classer_lot([exemple], filtre)[0]
+
+	def decoder_lot(self, exemples):
+
+		"""Voir Reseau.decoder_lot"""
+
+		return Reseau.decoder_lot(self, exemples)
+
+	def classifieur(self):
+
+		"""Voir ReseauOCR.classifieur"""
+
+		return self if self._classifieur_knn is None else self._classifieur_knn
+
+	def vecteurs_images(self, images):
+
+		"""Voir ReseauOCR.vecteurs_images"""
+
+		return ReseauOCR.vecteurs_images(self, images)
+
+	def reconnaitre_caractere(self, image, filtre = 0.5):
+
+		"""Voir ReseauOCR.reconnaitre_caractere"""
+
+		return self.reconnaitre_caracteres([image], filtre)[0]
+
+	def reconnaitre_caracteres(self, images, filtre = 0.5):
+
+		"""Voir ReseauOCR.reconnaitre_caracteres"""
+
+		return ReseauOCR.reconnaitre_caracteres(self, images, filtre)
 
-		chaines = ["", ]
+	def reconnaitre_chaine(self, image, decoupage = ImageBinaire.decouper, filtre = 0.5, largeur = 10, scores = False, lexique = None):
 
-		for image in liste:
+		"""Voir ReseauOCR.reconnaitre_chaine"""
 
-			caracteres = self.reconnaitre_caractere(image, filtre)
-			if not len(caracteres): caracteres.append("?")
+		return ReseauOCR.reconnaitre_chaine(self, image, decoupage, filtre, largeur, scores, lexique)
 
-			n_chaines = []
-			for chaine in chaines:
-				for c in caracteres:
-					n_chaines.append(chaine + c)
+	def reconnaitre_flux(self, sources, *args, **kwargs):
 
-			chaines = n_chaines[:]
+		"""Voir ReseauOCR.reconnaitre_flux"""
 
-		return chaines
+		return ReseauOCR.reconnaitre_flux(self, sources, *args, **kwargs)
@@ -0,0 +1,187 @@
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from ocr import *
+
+
+# Méthodes de découpage, comme dans l'onglet Reconnaissance (voir ui.MethodeDecoupage)
+
+decoupages = {
+	"aucun": False,
+	"colonne": ImageBinaire.decouper_colonnes,
+	"precis": ImageBinaire.decouper2,
+}
+
+
+# Réseau (et lexique) chargés une seule fois par processus
+
+_base = {}
+
+def _init_processus(reseau, options):
+
+	"""Garde le réseau figé (voir ReseauOCR.figer) et charge le lexique éventuel utilisés par ce processus pour toutes ses images"""
+
+	_base["reseau"] = reseau
+	_base["lexique"] = None if options["lexique"] is None else Lexique.charger(options["lexique"])
+	_base["options"] = options
+
+
+def reconnaitre_image(chemin):
+
+	"""Reconnaît le texte d'une image avec le réseau du processus. Renvoie un dictionnaire: chemin de l'image, chaînes probables et leurs distances (voir ReseauOCR.reconnaitre_chaine), durée du traitement et erreur éventuelle (image illisible...)"""
+
+	options = _base["options"]
+	debut = time.perf_counter()
+	try:
+		image = ImageBinaire.open(chemin)
+		resultats = _base["reseau"].reconnaitre_chaine(image, decoupages[options["decoupage"]], options["filtre"], options["largeur"], scores = True, lexique = _base["lexique"])
+		erreur = None
+	except Exception as e:
+		resultats, erreur = [], "{}: {}".format(type(e).__name__, e)
+	return {
+		"image": chemin,
+		"chaines": [chaine for chaine, score in resultats],
+		"scores": [score for chaine, score in resultats],
+		"duree": time.perf_counter() - debut,
+		"erreur": erreur,
+	}
+
+
+def lister_images(motifs):
+
+	"""Renvoie la liste triée des images désignées par 'motifs': des dossiers (toutes les images qu'ils contiennent), des motifs (ex: 'scans/**/*.png') ou des chemins"""
+
+	extensions = Image.registered_extensions() # Extensions reconnues par PIL
+	chemins = []
+	for motif in motifs:
+		if os.path.isdir(motif):
+			chemins.extend(os.path.join(motif, nom) for nom in sorted(os.listdir(motif)) if os.path.splitext(nom)[1].lower() in extensions)
+		else:
+			chemins.extend(sorted(glob.glob(motif, recursive = True)))
+	return list(dict.fromkeys(chemins)) # Sans doublons, dans l'ordre
+
+
+class SortieJSON:
+
+	"""Écrit un résultat par ligne, au format JSON (JSON Lines)"""
+
+	def __init__(self, fichier):
+
+		self.fichier = fichier
+
+	def ecrire(self, resultat):
+
+		self.fichier.write(json.dumps(resultat, ensure_ascii = False) + "\n")
+
+
+class SortieCSV:
+
+	"""Écrit un résultat par ligne, au format CSV: image, chaîne la plus probable et sa distance, toutes les chaînes (séparées par des espaces), durée et erreur"""
+
+	def __init__(self, fichier):
+
+		self.ecrivain = csv.writer(fichier)
+		self.ecrivain.writerow(["image", "chaine", "score", "chaines", "duree", "erreur"])
+
+	def ecrire(self, resultat):
+
+		chaine, score = (resultat["chaines"][0], resultat["scores"][0]) if len(resultat["chaines"]) else ("", "")
+		self.ecrivain.writerow([resultat["image"], chaine, score, " ".join(resultat["chaines"]), round(resultat["duree"], 6), resultat["erreur"] or ""])
+
+sorties = {
+	"jsonl": SortieJSON,
+	"csv": SortieCSV,
+}
+
+
+def traiter(fichier, chemins, sortie, format = "jsonl", processus = None, paquet = None, **options):
+
+	"""Reconnaît les images 'chemins' avec le réseau 'fichier' dans un ensemble de processus (le fichier est lu une seule fois, chaque processus reçoit une copie figée du réseau), et écrit les résultats dans le fichier ouvert 'sortie', dans l'ordre des images.
+	'options': decoupage (voir decoupages), filtre, largeur (voir ReseauOCR.reconnaitre_chaine), lexique (chemin, voir Lexique.charger) et knn (voir ReseauOCR.utiliser_knn). Renvoie les statistiques (voir statistiques)"""
+
+	options = dict({"decoupage": "colonne", "filtre": 0.5, "largeur": 10, "lexique": None, "knn": None}, **options)
+	processus = processus or os.cpu_count() or 1
+	if paquet is None: # Des paquets d'images plutôt qu'une image à la fois: moins d'échanges entre processus, sans trop déséquilibrer la charge
+		paquet = max(1, min(64, len(chemins)//(4*processus)))
+	ecrivain = sorties[format](sortie)
+
+	durees, erreurs = [], 0
+	debut = time.perf_counter()
+	reseau = ReseauOCR()
+	reseau.ouvrir(fichier, echantillons = options["knn"] is not None) # Les k plus proches voisins ont besoin des échantillons
+	if options["knn"] is not None:
+		reseau.utiliser_knn(options["knn"])
+	with multiprocessing.Pool(processus, initializer = _init_processus, initargs = (reseau.figer(), options)) as pool:
+		for resultat in pool.imap(reconnaitre_image, chemins, chunksize = paquet): # Dans l'ordre des images
+			ecrivain.ecrire(resultat)
+			durees.append(resultat["duree"])
+			erreurs += resultat["erreur"] is not None
+	total = time.perf_counter() - debut
+
+	return statistiques(durees, erreurs, total)
+
+
+def statistiques(durees, erreurs, total):
+
+	"""Renvoie un dictionnaire résumant un traitement: nombre d'images et d'erreurs, durée totale (chargement du réseau par les processus compris), débit (images par seconde), et latence par image (moyenne, médiane, 95e centile, maximum, en secondes)"""
+
+	durees = np.array(durees, dtype = float)
+	vide = not len(durees)
+	return {
+		"images": len(durees),
+		"erreurs": erreurs,
+		"total": total,
+		"debit": len(durees)/total if total > 0 else 0.0,
+		"latence_moyenne": 0.0 if vide else float(np.mean(durees)),
+		"latence_mediane": 0.0 if vide else float(np.percentile(durees, 50)),
+		"latence_95": 0.0 if vide else float(np.percentile(durees, 95)),
+		"latence_max": 0.0 if vide else float(np.max(durees)),
+	}
+
+
+def afficher_stats(stats, fichier = sys.stdout):
+
+	"""Affiche les statistiques d'un traitement (voir statistiques)"""
+
+	print("{} images ({} erreurs) en {:.2f}s".format(stats["images"], stats["erreurs"], stats["total"]), file = fichier)
+	print("Débit: {:.1f} images/s".format(stats["debit"]), file = fichier)
+	print("Latence par image: moyenne {:.1f} ms, médiane {:.1f} ms, 95e centile {:.1f} ms, max {:.1f} ms".format(
+		1000*stats["latence_moyenne"], 1000*stats["latence_mediane"], 1000*stats["latence_95"], 1000*stats["latence_max"]), file = fichier)
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description = "Reconnaissance de texte sans interface: applique un réseau sauvé à un ensemble d'images, réparties sur plusieurs processus.")
+	parser.add_argument("fichier", help = "le fichier de réseau (.json ou .zip)")
+	parser.add_argument("images", nargs = "+", help = "images, dossiers ou motifs (ex: 'scans/**/*.png')")
+	parser.add_argument("-o", "--sortie", default = "-", help = "fichier de résultats (par défaut, la sortie standard)")
+	parser.add_argument("-f", "--format", choices = list(sorties.keys()), default = None, help = "format des résultats (par défaut, selon l'extension de la sortie, sinon jsonl)")
+	parser.add_argument("-d", "--decoupage", choices = list(decoupages.keys()), default = "colonne", help = "méthode de découpage des caractères")
+	parser.add_argument("-s", "--filtre", type = float, default = 0.5, help = "seuil de reconnaissance d'un caractère")
+	parser.add_argument("-b", "--largeur", type = int, default = 10, help = "nombre de chaînes gardées (recherche en faisceau)")
+	parser.add_argument("-x", "--lexique", default = None, help = "lexique des mots attendus (voir Lexique.charger)")
+	parser.add_argument("-k", "--knn", type = int, default = None, help = "reconnaissance par les K plus proches échantillons plutôt que par le réseau")
+	parser.add_argument("-p", "--processus", type = int, default = None, help = "nombre de processus (par défaut, un par coeur)")
+	parser.add_argument("--paquet", type = int, default = None, help = "nombre d'images envoyées à la fois à un processus")
+	args = parser.parse_args()
+
+	chemins = lister_images(args.images)
+	format = args.format or ("csv" if args.sortie.lower().endswith(".csv") else "jsonl")
+	options = {"decoupage": args.decoupage, "filtre": args.filtre, "largeur": args.largeur, "lexique": args.lexique, "knn": args.knn}
+
+	if args.sortie == "-":
+		stats = traiter(args.fichier, chemins, sys.stdout, format, args.processus, args.paquet, **options)
+		afficher_stats(stats, sys.stderr) # Les résultats seuls sur la sortie standard
+	else:
+		with open(args.sortie, "w+", newline = "", encoding = "utf-8") as sortie:
+			stats = traiter(args.fichier, chemins, sortie, format, args.processus, args.paquet, **options)
+		afficher_stats(stats)
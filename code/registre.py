@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+
+from ocr import *
+
+
+# Une version chargée d'un modèle, utilisée seulement pour la reconnaissance
+
+class Instantane:
+
+	"""Un réseau chargé depuis un fichier pour la reconnaissance seulement: une copie figée (voir ReseauFige), sans les images des échantillons.
+	Une requête commencée avec un instantané peut le garder jusqu'au bout, même si une nouvelle version le remplace entre temps"""
+
+	def __init__(self, chemin, version = 1):
+
+		debut = time.perf_counter()
+		self.chemin = chemin
+		self.version = version
+		self.signature = Registre.signature(chemin) # Avant la lecture: une modification pendant le chargement sera vue
+		reseau = ReseauOCR()
+		reseau.ouvrir(chemin, echantillons = False)
+		if reseau.knn is not None: # Les k plus proches voisins ont besoin des échantillons, le temps de construire l'index
+			reseau = ReseauOCR()
+			reseau.ouvrir(chemin)
+		self.reseau = reseau.figer()
+		self.classifieur = self.reseau.classifieur() # Le réseau, ou les k plus proches voisins
+		self.date = time.time()
+		self.duree = time.perf_counter() - debut # Temps de chargement
+
+
+# Le registre: plusieurs modèles désignés par un nom, rechargés quand leur fichier change
+
+class Registre:
+
+	"""Ensemble de modèles (fichiers .json ou .zip) désignés par un nom. Registre.obtenir renvoie la version courante (un Instantane) d'un modèle et compte les requêtes.
+	Registre.verifier (appelé toutes les 'periode' secondes par Registre.surveiller) recharge les fichiers modifiés: la nouvelle version remplace l'ancienne d'un seul coup, une fois entièrement chargée; en cas d'erreur (fichier en cours d'écriture...), l'ancienne version reste en place"""
+
+	def __init__(self, periode = 1.0):
+
+		self.periode = periode
+		self.chemins = {} # {nom: chemin}
+		self.modeles = {} # {nom: Instantane}, remplacé en bloc lors d'un rechargement
+		self.requetes = {} # {nom: nombre de requêtes}
+		self.chargements = {} # {nom: nombre de chargements réussis}
+		self.erreurs = {} # {nom: dernière erreur de chargement, ou None}
+		self._vues = {} # {nom: signature du fichier au dernier passage de Registre.verifier}
+		self.erreur = None # Dernière erreur imprévue de la surveillance (voir Registre.surveiller)
+		self._verrou = threading.Lock()
+		self._arret = threading.Event()
+		self._fil = None
+
+	def signature(chemin):
+
+		"""Renvoie ce qui permet de voir qu'un fichier a changé: date de modification (en nanosecondes) et taille"""
+
+		infos = os.stat(chemin)
+		return (infos.st_mtime_ns, infos.st_size)
+
+	def ajouter(self, nom, chemin):
+
+		"""Charge un modèle sous le nom 'nom' (remplace le modèle de même nom éventuel). Lève l'erreur de chargement le cas échéant"""
+
+		instantane = Instantane(chemin)
+		with self._verrou:
+			self.chemins[nom] = chemin
+			self.modeles[nom] = instantane
+			self.requetes.setdefault(nom, 0)
+			self.chargements[nom] = self.chargements.get(nom, 0) + 1
+			self.erreurs[nom] = None
+			self._vues[nom] = instantane.signature
+
+	def enlever(self, nom):
+
+		"""Retire un modèle du registre (les requêtes en cours gardent leur instantané)"""
+
+		with self._verrou:
+			for dictionnaire in (self.chemins, self.modeles, self.requetes, self.chargements, self.erreurs, self._vues):
+				dictionnaire.pop(nom, None)
+
+	def noms(self):
+
+		return list(self.modeles.keys())
+
+	def obtenir(self, nom):
+
+		"""Renvoie la version courante du modèle 'nom' (KeyError s'il n'existe pas), et compte une requête"""
+
+		with self._verrou:
+			instantane = self.modeles[nom]
+			self.requetes[nom] += 1
+		return instantane
+
+	def verifier(self):
+
+		"""Recharge les modèles dont le fichier a changé depuis leur chargement, et n'a plus changé depuis le passage précédent (pour ne pas lire un fichier en cours d'écriture). Renvoie les noms des modèles rechargés"""
+
+		recharges = []
+		for nom, chemin in list(self.chemins.items()):
+			try:
+				signature = Registre.signature(chemin)
+			except OSError: # Fichier momentanément absent (remplacé...): l'ancienne version reste
+				continue
+			with self._verrou:
+				if self.chemins.get(nom) != chemin: # Enlevé ou remplacé entre temps
+					continue
+				ancien = self.modeles.get(nom)
+				stable = signature == self._vues.get(nom)
+				self._vues[nom] = signature
+			if ancien is None or signature == ancien.signature or not stable:
+				continue
+			try:
+				instantane = Instantane(chemin, ancien.version + 1)
+			except Exception as e:
+				with self._verrou:
+					if self.chemins.get(nom) == chemin:
+						self.erreurs[nom] = "{}: {}".format(type(e).__name__, e)
+				continue
+			with self._verrou:
+				if self.chemins.get(nom) != chemin: # Enlevé ou remplacé pendant le chargement
+					continue
+				self.modeles[nom] = instantane # Échange en un seul coup: les nouvelles requêtes utilisent la nouvelle version
+				self.chargements[nom] += 1
+				self.erreurs[nom] = None
+			recharges.append(nom)
+		return recharges
+
+	def surveiller(self):
+
+		"""Démarre la surveillance des fichiers dans un fil d'exécution (voir Registre.verifier), jusqu'à Registre.arreter"""
+
+		if self._fil is not None:
+			return
+		self._arret.clear()
+		self._fil = threading.Thread(target = self._surveillance, daemon = True)
+		self._fil.start()
+
+	def _surveillance(self):
+
+		while not self._arret.wait(self.periode):
+			try:
+				self.verifier()
+			except Exception as e: # Une erreur imprévue ne doit pas arrêter la surveillance
+				self.erreur = "{}: {}".format(type(e).__name__, e)
+
+	def arreter(self):
+
+		"""Arrête la surveillance des fichiers"""
+
+		self._arret.set()
+		if self._fil is not None:
+			self._fil.join()
+			self._fil = None
+
+	def stats(self):
+
+		"""Renvoie, pour chaque modèle: chemin, version, nombre de requêtes et de chargements, durée et date du dernier chargement, dernière erreur de chargement"""
+
+		with self._verrou:
+			return {nom: {
+				"chemin": instantane.chemin,
+				"version": instantane.version,
+				"requetes": self.requetes[nom],
+				"chargements": self.chargements[nom],
+				"chargement_s": instantane.duree,
+				"charge_le": instantane.date,
+				"knn": instantane.reseau.knn,
+				"erreur": self.erreurs[nom],
+			} for nom, instantane in self.modeles.items()}
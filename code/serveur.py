@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import collections
+import io
+import json
+import math
+import os
+import time
+import urllib.parse
+
+import numpy as np
+
+from ocr import *
+from reconnaitre import decoupages
+from registre import Registre
+
+
+# Regroupement des requêtes simultanées en lots, évalués en une seule passe du réseau
+
+class Regroupeur:
+
+	"""Rassemble les vecteurs des requêtes arrivées pendant une courte fenêtre de temps ('fenetre', en secondes), ou jusqu'à 'max_lot' requêtes, et les classe en un seul appel à distances_lot par classifieur (un lot peut mêler plusieurs modèles, ou deux versions d'un même modèle)"""
+
+	def __init__(self, max_lot = 32, fenetre = 0.005):
+
+		self.max_lot = max_lot
+		self.fenetre = fenetre
+		self.file = asyncio.Queue() # Bornée par le serveur (voir ServeurOCR.profondeur)
+		self.tailles = collections.deque(maxlen = 10000) # Nombre de requêtes de chaque lot
+
+	async def distances(self, classifieur, vecteurs):
+
+		"""Renvoie la matrice des distances des vecteurs d'une requête pour 'classifieur' (le réseau ou les k plus proches voisins, voir Reseau.distances_lot), une fois son lot évalué"""
+
+		futur = asyncio.get_running_loop().create_future()
+		self.file.put_nowait((classifieur, vecteurs, futur))
+		return await futur
+
+	async def boucle(self):
+
+		"""Tâche de fond: forme les lots et les évalue (dans un fil d'exécution, pour ne pas bloquer le serveur)"""
+
+		boucle = asyncio.get_running_loop()
+		while True:
+			lot = [await self.file.get()]
+			limite = boucle.time() + self.fenetre
+			while len(lot) < self.max_lot:
+				reste = limite - boucle.time()
+				if reste <= 0:
+					break
+				try:
+					lot.append(await asyncio.wait_for(self.file.get(), reste))
+				except asyncio.TimeoutError:
+					break
+			self.tailles.append(len(lot))
+
+			groupes = {} # Requêtes du lot par classifieur
+			for classifieur, vecteurs, futur in lot:
+				groupes.setdefault(id(classifieur), (classifieur, []))[1].append((vecteurs, futur))
+			for classifieur, requetes in groupes.values():
+				tous = [vecteur for vecteurs, futur in requetes for vecteur in vecteurs]
+				try:
+					distances = await boucle.run_in_executor(None, Regroupeur._distances, classifieur, tous)
+				except Exception as e:
+					for vecteurs, futur in requetes:
+						if not futur.done(): futur.set_exception(e)
+					continue
+				position = 0
+				for vecteurs, futur in requetes:
+					if not futur.done(): # Le client a pu abandonner entre temps
+						futur.set_result(distances[position:position+len(vecteurs)])
+					position += len(vecteurs)
+
+	def _distances(classifieur, vecteurs):
+
+		"""Fonction interne: une seule passe pour toutes les requêtes d'un classifieur"""
+
+		if not len(vecteurs):
+			return np.zeros((0, len(classifieur.classes)))
+		return classifieur.distances_lot(vecteurs)
+
+
+# Le serveur: un HTTP minimal (HTTP/1.1, connexions persistantes), sur TCP ou sur une socket Unix
+
+class ServeurOCR:
+
+	"""Sert les modèles d'un Registre sur le réseau local:
+	POST /reconnaitre (corps: une image PNG; paramètres facultatifs modele, decoupage, filtre, largeur): renvoie {"modele": ..., "version": ..., "chaines": [...], "scores": [...]} comme ReseauOCR.reconnaitre_chaine
+	GET /stats: nombre de requêtes, d'erreurs et de refus, taille des lots, requêtes en cours, latences (centiles, en millisecondes), statistiques de chaque modèle (voir Registre.stats) et dernière erreur imprévue de la surveillance des fichiers.
+	Une requête utilise du début à la fin la version du modèle courante à son arrivée, même si le fichier est rechargé entre temps.
+	Au plus 'profondeur' requêtes sont traitées à la fois: au-delà, le serveur répond 503 plutôt que de laisser s'allonger l'attente.
+	Un corps de plus de 'taille_max' octets n'est pas lu: le serveur répond 413 et ferme la connexion"""
+
+	def __init__(self, registre, lexique = None, max_lot = 32, fenetre = 0.005, profondeur = 256, defaut = None, taille_max = 16*1024*1024):
+
+		self.registre = registre
+		self.defaut = defaut # Modèle utilisé si la requête n'en précise pas (par défaut, le premier du registre)
+		self.lexique = lexique
+		self.regroupeur = Regroupeur(max_lot, fenetre)
+		self.profondeur = profondeur
+		self.taille_max = taille_max
+		self.en_cours = 0
+		self.latences = collections.deque(maxlen = 10000) # Durée des dernières requêtes réussies (en secondes)
+		self.compteurs = {"requetes": 0, "erreurs": 0, "refus": 0}
+		self.debut = time.time()
+		self._taches = []
+
+	async def demarrer(self, hote = "127.0.0.1", port = 8080, socket = None):
+
+		"""Démarre le serveur (sur la socket Unix 'socket' si elle est donnée) et la formation des lots. Renvoie le asyncio.Server"""
+
+		self._taches.append(asyncio.ensure_future(self.regroupeur.boucle()))
+		if socket is not None:
+			return await asyncio.start_unix_server(self.connexion, path = socket)
+		return await asyncio.start_server(self.connexion, hote, port)
+
+	async def arreter(self):
+
+		"""Arrête la formation des lots"""
+
+		for tache in self._taches:
+			tache.cancel()
+		self._taches = []
+
+	async def connexion(self, lecteur, ecrivain):
+
+		"""Traite les requêtes d'une connexion, jusqu'à sa fermeture"""
+
+		try:
+			while True:
+				requete = await ServeurOCR.lire_requete(lecteur, self.taille_max)
+				if requete is None:
+					break
+				methode, chemin, entetes, corps, erreur = requete
+				if erreur is not None: # Corps non lu: la connexion ne peut pas servir à d'autres requêtes
+					self.compteurs["erreurs"] += 1
+					statut, reponse = erreur
+					fermer = True
+				else:
+					statut, reponse = await self.repondre(methode, chemin, corps)
+					fermer = entetes.get("connection", "").lower() == "close"
+				ServeurOCR.ecrire_reponse(ecrivain, statut, reponse, fermer)
+				await ecrivain.drain()
+				if fermer:
+					break
+		except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+			pass
+		finally:
+			ecrivain.close()
+
+	async def lire_requete(lecteur, taille_max):
+
+		"""Lit une requête HTTP: renvoie (méthode, chemin, en-têtes, corps, erreur), ou None si la connexion est fermée.
+		Si l'en-tête Content-Length est invalide (400) ou dépasse 'taille_max' octets (413), le corps n'est pas lu, et 'erreur' est le couple (statut, réponse) à renvoyer; sinon 'erreur' vaut None"""
+
+		ligne = await lecteur.readline()
+		if not ligne:
+			return None
+		methode, chemin, version = ligne.decode("latin-1").split()
+		entetes = {}
+		while True:
+			ligne = (await lecteur.readline()).decode("latin-1").strip()
+			if not ligne:
+				break
+			nom, valeur = ligne.split(":", 1)
+			entetes[nom.strip().lower()] = valeur.strip()
+		longueur = entetes.get("content-length", "0")
+		if not (longueur.isascii() and longueur.isdigit()): # Ni signe, ni espace: un entier positif seulement
+			return methode, chemin, entetes, b"", (400, {"erreur": "Content-Length invalide: " + longueur})
+		if int(longueur) > taille_max:
+			return methode, chemin, entetes, b"", (413, {"erreur": "corps trop grand: {} octets, au plus {}".format(longueur, taille_max)})
+		corps = await lecteur.readexactly(int(longueur))
+		return methode, chemin, entetes, corps, None
+
+	def ecrire_reponse(ecrivain, statut, reponse, fermer = False):
+
+		"""Écrit une réponse HTTP au format JSON"""
+
+		raisons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Content Too Large", 503: "Service Unavailable"}
+		corps = json.dumps(reponse, ensure_ascii = False).encode("utf-8")
+		entetes = "HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {}\r\n".format(statut, raisons.get(statut, ""), len(corps))
+		if fermer:
+			entetes += "Connection: close\r\n"
+		ecrivain.write(entetes.encode("latin-1") + b"\r\n" + corps)
+
+	async def repondre(self, methode, chemin, corps):
+
+		"""Renvoie le statut et la réponse (à écrire en JSON) d'une requête"""
+
+		url = urllib.parse.urlsplit(chemin)
+		parametres = dict(urllib.parse.parse_qsl(url.query))
+		if url.path == "/stats":
+			return 200, self.stats()
+		if url.path != "/reconnaitre":
+			return 404, {"erreur": "chemin inconnu: " + url.path}
+		if methode != "POST":
+			return 405, {"erreur": "POST attendu"}
+
+		debut = time.perf_counter()
+		self.compteurs["requetes"] += 1
+		if self.en_cours >= self.profondeur:
+			self.compteurs["refus"] += 1
+			return 503, {"erreur": "trop de requêtes en cours"}
+		self.en_cours += 1
+		try:
+			nom = parametres.get("modele", self.defaut or (self.registre.noms() or [None])[0])
+			try: modele = self.registre.obtenir(nom) # La version courante, gardée jusqu'à la fin de la requête
+			except KeyError: return 404, {"erreur": "modèle inconnu: {}".format(nom)}
+			decoupage = decoupages[parametres.get("decoupage", "colonne")]
+			filtre, largeur = float(parametres.get("filtre", 0.5)), int(parametres.get("largeur", 10))
+			if not math.isfinite(filtre) or largeur < 1: # Refusés avant de traiter l'image (voir ReseauOCR.recherche_faisceau)
+				raise ValueError("paramètres invalides: filtre = {} (un nombre fini), largeur = {} (au moins 1)".format(filtre, largeur))
+			boucle = asyncio.get_running_loop()
+			vecteurs = await boucle.run_in_executor(None, ServeurOCR.preparer, modele.reseau, corps, decoupage) # Décodage et découpage, hors de la boucle
+			distances = await self.regroupeur.distances(modele.classifieur, vecteurs)
+			resultats = ReseauOCR.recherche_faisceau(distances, modele.classifieur.classes, filtre, largeur, self.lexique)
+		except Exception as e: # Image illisible, paramètre invalide...
+			self.compteurs["erreurs"] += 1
+			return 400, {"erreur": "{}: {}".format(type(e).__name__, e)}
+		finally:
+			self.en_cours -= 1
+
+		self.latences.append(time.perf_counter() - debut)
+		return 200, {"modele": nom, "version": modele.version, "chaines": [chaine for chaine, score in resultats], "scores": [score for chaine, score in resultats]}
+
+	def preparer(reseau, corps, decoupage):
+
+		"""Renvoie les vecteurs des caractères d'une image (contenu d'un fichier PNG, ou de tout format lisible par PIL) pour la grille du réseau 'reseau'"""
+
+		image = ImageBinaire.open(io.BytesIO(corps))
+		return reseau.vecteurs_images(image.caracteres(decoupage))
+
+	def stats(self):
+
+		"""Renvoie les statistiques du serveur"""
+
+		latences = 1000*np.array(self.latences, dtype = float)
+		centiles = {"p{}".format(p): float(np.percentile(latences, p)) if len(latences) else 0.0 for p in (50, 90, 99)}
+		centiles["max"] = float(latences.max()) if len(latences) else 0.0
+		tailles = self.regroupeur.tailles
+		return dict(self.compteurs,
+			lots = len(tailles),
+			taille_lot_moyenne = float(np.mean(tailles)) if len(tailles) else 0.0,
+			taille_lot_max = max(tailles) if len(tailles) else 0,
+			en_cours = self.en_cours,
+			latence_ms = centiles,
+			duree = time.time() - self.debut,
+			modeles = self.registre.stats(),
+			erreur_surveillance = self.registre.erreur,
+		)
+
+
+def lire_modele(texte):
+
+	"""Lit un modèle écrit 'nom=chemin', ou 'chemin' (le nom est alors celui du fichier, sans extension)"""
+
+	nom, egal, chemin = texte.partition("=")
+	if not egal:
+		chemin = texte
+		nom = os.path.splitext(os.path.basename(texte))[0]
+	return nom, chemin
+
+
+async def servir(modeles, hote = "127.0.0.1", port = 8080, socket = None, lexique = None, periode = 1.0, **options):
+
+	"""Charge les modèles 'modeles' (liste de couples (nom, chemin)) dans un registre qui surveille leurs fichiers, et le lexique 'lexique' (un chemin), puis sert les requêtes indéfiniment (voir ServeurOCR)"""
+
+	registre = Registre(periode)
+	for nom, chemin in modeles:
+		registre.ajouter(nom, chemin)
+		print("Modèle {} ({}) chargé en {:.2f}s".format(nom, chemin, registre.modeles[nom].duree))
+	registre.surveiller()
+	serveur = ServeurOCR(registre, None if lexique is None else Lexique.charger(lexique), **options)
+	serveur_asyncio = await serveur.demarrer(hote, port, socket)
+	print("Servi sur {}".format(socket or "http://{}:{}".format(hote, serveur_asyncio.sockets[0].getsockname()[1])))
+	try:
+		async with serveur_asyncio:
+			await serveur_asyncio.serve_forever()
+	finally:
+		registre.arreter()
+
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description = "Service local de reconnaissance: POST /reconnaitre avec une image PNG, GET /stats. Les fichiers des modèles sont surveillés et rechargés quand ils changent.")
+	parser.add_argument("modeles", nargs = "+", type = lire_modele, help = "fichiers de réseau (.json ou .zip), sous la forme nom=chemin ou chemin; le premier est le modèle par défaut")
+	parser.add_argument("--hote", default = "127.0.0.1", help = "adresse d'écoute")
+	parser.add_argument("--port", type = int, default = 8080, help = "port d'écoute (0: un port libre)")
+	parser.add_argument("--socket", default = None, help = "écouter sur cette socket Unix plutôt qu'en TCP")
+	parser.add_argument("-l", "--max-lot", type = int, default = 32, help = "nombre maximal de requêtes par lot")
+	parser.add_argument("-w", "--fenetre", type = float, default = 5, help = "attente maximale pour former un lot (en millisecondes)")
+	parser.add_argument("-q", "--profondeur", type = int, default = 256, help = "nombre maximal de requêtes en attente d'un lot")
+	parser.add_argument("--taille-max", type = float, default = 16, help = "taille maximale d'une image envoyée (en mégaoctets)")
+	parser.add_argument("-x", "--lexique", default = None, help = "lexique des mots attendus (voir Lexique.charger)")
+	parser.add_argument("--periode", type = float, default = 1.0, help = "intervalle de vérification des fichiers des modèles (en secondes)")
+	args = parser.parse_args()
+
+	asyncio.run(servir(args.modeles, args.hote, args.port, args.socket, args.lexique, args.periode, max_lot = args.max_lot, fenetre = args.fenetre/1000, profondeur = args.profondeur, taille_max = int(args.taille_max*1024*1024)))
@@ -908,6 +908,19 @@ class OptionsEntrainement(ttk.LabelFrame):
 		spinbox = Spinbox(self, from_ = 0.0, to = 1.0, increment = 0.01, width = 5, textvariable = self.inertie)
 		spinbox.grid(column = 1, row = 3, padx = 5)
 
+		self.meilleur = BooleanVar()
+		self.meilleur.set(False)
+		check = ttk.Checkbutton(self, text = "Garder les meilleurs poids", variable = self.meilleur)
+		check.grid(column = 0, row = 4, columnspan = 2, padx = 5)
+
+		l3 = ttk.Label(self, text = "Patience:")
+		l3.grid(column = 0, row = 5, padx = 5)
+		l3.bind("<Button-1>", self.aide_patience)
+		self.patience = IntVar()
+		self.patience.set(0)
+		spinbox = Spinbox(self, from_ = 0, to = 1000, increment = 1, width = 5, textvariable = self.patience)
+		spinbox.grid(column = 1, row = 5, padx = 5)
+
 	def aide_taux_app(self, event):
 
 		messagebox.showinfo("Taux d'apprentissage", "Le taux d'apprentissage contrôle l'impact des corrections de l'algorithme d'entraînement. Plus le taux est important, plus les corrections apportées à un neurone seront importantes.")
@@ -916,6 +929,10 @@ class OptionsEntrainement(ttk.LabelFrame):
 
 		messagebox.showinfo("Inertie", "À chaque correction d'un neurone, la correction précédente est appliquée à nouveau à un facteur près, l'inertie. Une inertie égale à 1 applique intégralement la correction précédente. Une inertie nulle annule complètement l'effet d'inertie.")
 
+	def aide_patience(self, event):
+
+		messagebox.showinfo("Patience", "L'apprentissage s'arrête de lui-même si l'erreur de validation (ou l'erreur moyenne, sans validation) ne s'est pas améliorée depuis ce nombre de cycles, et les poids ayant donné la plus petite erreur sont conservés. Une patience nulle désactive cet arrêt anticipé.")
+
 	def get(self):
 
 		return {
@@ -923,6 +940,8 @@ class OptionsEntrainement(ttk.LabelFrame):
 			"validation": self.validation.get(),
 			"taux_app": self.taux_app.get(),
 			"inertie": self.inertie.get(),
+			"meilleur": self.meilleur.get(),
+			"patience": self.patience.get() or None, # 0: pas d'arrêt anticipé
 		}
 
 
@@ -943,7 +962,7 @@ class MethodeDecoupage(ttk.Frame):
 
 		methode_decoupage = {
 			"pas_decoupage": False,
-			"colonne": ImageBinaire.decouper_verticalement,
+			"colonne": ImageBinaire.decouper_colonnes,
 			"precis": ImageBinaire.decouper2,
 		}
 		return methode_decoupage[self.decoupage.get()]
@@ -964,6 +983,7 @@ class StructureReseau(Onglet):
 		self.caracs.set(s)
 
 		self.codage.set(self.reseau.codage)
+		self.softmax.set(self.reseau.softmax)
 
 	def __init__(self, parent, app):
 
@@ -1019,7 +1039,11 @@ class StructureReseau(Onglet):
 		combo.grid(column = 1 , row = 1, padx = 5, pady = 5)
 		combo["values"] = list(Reseau.codages.keys())
 
-		ttk.Button(f, text = "OK", command = self.couche_sortie).grid(column = 2, row = 0, rowspan = 2, padx = 5, pady = 5)
+		self.softmax = BooleanVar()
+		self.softmax.set(False)
+		ttk.Checkbutton(f, text = "Sortie softmax (codage simple)", variable = self.softmax).grid(column = 0, row = 2, columnspan = 2, padx = 5, pady = 5)
+
+		ttk.Button(f, text = "OK", command = self.couche_sortie).grid(column = 2, row = 0, rowspan = 3, padx = 5, pady = 5)
 
 		self.changement_fichier()
 
@@ -1058,6 +1082,10 @@ class StructureReseau(Onglet):
 			classe = classe.strip() # strip() enlève les espaces, comme ça on peut lire aussi bien 'a,b,c' que 'a, b, c' ou encore 'a,b, c'
 			self.reseau.ajout_classe(classe)
 
+		if not self.reseau.utiliser_softmax(self.softmax.get()):
+			self.softmax.set(False)
+			messagebox.showerror("Erreur", "La sortie softmax nécessite le codage simple.")
+
 		# Il faut absolument réinitialiser après ce genre de modifications, puisque la taille des neurones est déterminée par la taille des couches précédentes
 		self.reseau.initialiser(self.reseau.grille)
 		self.fichier_modifie()
@@ -1192,9 +1220,7 @@ class Apprentissage(Onglet):
 
 			image = self.app.image()
 			decoupage = self.decoupage.get()
-			liste = [image]
-			if decoupage is not False:
-				liste = [ImageBinaire.depuis_liste(carac) for carac in decoupage(image)]
+			liste = image.caracteres(decoupage)
 
 			if len(liste) != len(chaine):
 
@@ -1239,14 +1265,15 @@ class Apprentissage(Onglet):
 
 			self.time = time.time()
 
-			for cycle, (err, err_val) in enumerate(self.reseau.entrainer_cycle(exemples, resultats, taux_app = taux_app, inertie = inertie, validation = validation)):
+			# Les meilleurs poids éventuels sont remis en place dès la sortie de la boucle (arrêt, maximum de cycles ou arrêt anticipé)
+			for cycle, (err, err_val) in enumerate(self.reseau.entrainer_cycle(exemples, resultats, taux_app = taux_app, inertie = inertie, validation = validation, patience = options["patience"], meilleur = options["meilleur"])):
 				self.graphe.ajouter_point(courbe1, cycle, err)
 				if validation: self.graphe.ajouter_point(courbe2, cycle, err_val)
 				self.root.update()
 				if self.stop or cycle == int(self.max_cycles.get()):
-					self.delta = time.time() - self.time
-					self.fichier_modifie()
 					break
+			self.delta = time.time() - self.time
+			self.fichier_modifie()
 
 			messagebox.showinfo("Terminé", "Apprentissage terminé!")
 